@@ -38,6 +38,12 @@ class Settings(BaseSettings):
     RAG_MAX_CACHE_SIZE: int = 100  # Cache up to 100 queries
     TRANSLATION_TIMEOUT: float = 2.0  # Fast translation timeout
 
+    # Database connection pool
+    DB_POOL_SIZE: int = 20  # Sized for concurrent consultations
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 1800  # Recycle well before MySQL wait_timeout drops idle connections
+    DB_POOL_PRE_PING: bool = True  # Ping on checkout; deployments may opt out with DB_POOL_PRE_PING=false
+
 
 
     HOST: str = "0.0.0.0"
@@ -1,18 +1,24 @@
+import orjson
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from config import settings
 URL_DATABASE = settings.DATABASE_URL
 
-# Conservative async engine defaults suitable for production
-# Pool sizes should be adapted to DB capacity; these are safe starting points
+# Async engine pool; sizes come from settings and should be adapted to DB capacity.
+# Connections are pinged on checkout and recycled before the server's idle timeout
 engine = create_async_engine(
     URL_DATABASE,
     future=True,
-    pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE,
     pool_timeout=30,
+    # Larger compiled-statement cache so hot login/consultation queries are not evicted under load
+    query_cache_size=1200,
+    # JSON columns (audit old_values/new_values) are encoded with orjson instead of stdlib json
+    json_serializer=lambda value: orjson.dumps(value).decode(),
 )
 
 AsyncSessionLocal = sessionmaker(
@@ -282,6 +282,17 @@ async def health_check():
     except Exception as e:
         return {"status": "degraded", "db": str(e)}
 
+@app.on_event("startup")
+async def _start_background_writers():
+    from service.consultation_service import start_telemetry_writer
+    start_telemetry_writer()
+
+@app.on_event("shutdown")
+async def _flush_background_writers():
+    # Persist API telemetry still buffered in memory
+    from service.consultation_service import flush_telemetry
+    await flush_telemetry()
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: StarletteRequest, exc: Exception):
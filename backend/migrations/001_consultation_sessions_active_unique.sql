@@ -0,0 +1,24 @@
+-- Brings a database created from an older the_final.sql up to the one-active-session-per-
+-- consultation guarantee that get_or_create_session relies on. New installs already get
+-- it from the_final.sql; run this once against existing databases.
+
+-- 1. The unique key cannot be added while a consultation has several active sessions:
+--    keep the newest one and close the rest
+UPDATE consultation_sessions cs
+JOIN (
+    SELECT consultation_id, MAX(session_id) AS keep_session_id
+    FROM consultation_sessions
+    WHERE session_status = 'active'
+    GROUP BY consultation_id
+    HAVING COUNT(*) > 1
+) dup ON dup.consultation_id = cs.consultation_id
+SET cs.session_status = 'closed',
+    cs.session_end = COALESCE(cs.session_end, NOW())
+WHERE cs.session_status = 'active'
+  AND cs.session_id <> dup.keep_session_id;
+
+-- 2. Generated column holding consultation_id only while the session is active, and the
+--    unique key over it (NULLs do not collide, so closed sessions are unconstrained)
+ALTER TABLE consultation_sessions
+    ADD COLUMN active_consultation_id INT AS (CASE WHEN session_status = 'active' THEN consultation_id END) STORED AFTER session_status,
+    ADD UNIQUE KEY uq_cs_active_consultation (active_consultation_id);
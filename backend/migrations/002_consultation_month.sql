@@ -0,0 +1,7 @@
+-- Adds the stored consultation_month column that the Consultation model maps and that
+-- consultations_monthly groups on, with the index over it. New installs already get both
+-- from the_final.sql; run this once against existing databases.
+
+ALTER TABLE consultation
+    ADD COLUMN consultation_month CHAR(7) AS (DATE_FORMAT(consultation_date, '%Y-%m')) STORED AFTER updated_at,
+    ADD INDEX idx_consult_doctor_month (doctor_id, consultation_month);
@@ -0,0 +1,7 @@
+-- Replaces idx_hur_user (user_id) with idx_hur_user_active (user_id, is_active), which with the
+-- implicit primary key columns covers the login hospital-roles lookup. New installs already
+-- get it from the_final.sql; run this once against existing databases.
+
+-- The new index is added first so the user_id foreign key always has an index to use
+ALTER TABLE hospital_user_roles ADD INDEX idx_hur_user_active (user_id, is_active);
+ALTER TABLE hospital_user_roles DROP INDEX idx_hur_user;
@@ -0,0 +1,7 @@
+-- Replaces idx_cs_consultation (consultation_id) with idx_cs_consultation_end
+-- (consultation_id, session_end, session_start), which covers the consultation duration sums.
+-- New installs already get it from the_final.sql; run this once against existing databases.
+
+-- The new index is added first so the consultation_id foreign key always has an index to use
+ALTER TABLE consultation_sessions ADD INDEX idx_cs_consultation_end (consultation_id, session_end, session_start);
+ALTER TABLE consultation_sessions DROP INDEX idx_cs_consultation;
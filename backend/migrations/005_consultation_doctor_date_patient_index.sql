@@ -0,0 +1,8 @@
+-- Replaces idx_consult_doctor_date (doctor_id, consultation_date) with
+-- idx_consult_doctor_date_patient (doctor_id, consultation_date, patient_id), which covers the
+-- doctor listings and analytics. New installs already get it from the_final.sql; run this
+-- once against existing databases.
+
+-- The new index is added first so the doctor_id foreign key always has an index to use
+ALTER TABLE consultation ADD INDEX idx_consult_doctor_date_patient (doctor_id, consultation_date, patient_id);
+ALTER TABLE consultation DROP INDEX idx_consult_doctor_date;
@@ -208,7 +208,8 @@ class Consultation(Base):
         ForeignKeyConstraint(['patient_id'], ['users.user_id'], ondelete='CASCADE', name='consultation_ibfk_1'),
         ForeignKeyConstraint(['specialty_id'], ['specialties.specialty_id'], ondelete='CASCADE', name='consultation_ibfk_4'),
         Index('hospital_id', 'hospital_id'),
-        Index('idx_consult_doctor_date', 'doctor_id', 'consultation_date'),
+        Index('idx_consult_doctor_date_patient', 'doctor_id', 'consultation_date', 'patient_id'),
+        Index('idx_consult_doctor_month', 'doctor_id', 'consultation_month'),
         Index('idx_consult_patient_date', 'patient_id', 'consultation_date'),
         Index('specialty_id', 'specialty_id')
     )
@@ -224,6 +225,7 @@ class Consultation(Base):
     total_duration: Mapped[Optional[int]] = mapped_column(Integer, server_default=text("'0'"))
     created_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, server_default=text('CURRENT_TIMESTAMP'))
     updated_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, server_default=text('CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP'))
+    consultation_month: Mapped[Optional[str]] = mapped_column(String(7, 'utf8mb4_unicode_ci'), Computed("(date_format(`consultation_date`,'%Y-%m'))", persisted=True))
 
     doctor: Mapped['Users'] = relationship('Users', foreign_keys=[doctor_id], back_populates='consultation')
     hospital: Mapped[Optional['HospitalMaster']] = relationship('HospitalMaster', back_populates='consultation')
@@ -338,7 +340,7 @@ class HospitalUserRoles(Base):
         ForeignKeyConstraint(['hospital_role_id'], ['hospital_role.hospital_role_id'], ondelete='CASCADE', name='hospital_user_roles_ibfk_3'),
         ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE', name='hospital_user_roles_ibfk_2'),
         Index('idx_hur_role', 'hospital_role_id'),
-        Index('idx_hur_user', 'user_id')
+        Index('idx_hur_user_active', 'user_id', 'is_active')
     )
 
     hospital_id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -446,7 +448,8 @@ class ConsultationSessions(Base):
     __tablename__ = 'consultation_sessions'
     __table_args__ = (
         ForeignKeyConstraint(['consultation_id'], ['consultation.consultation_id'], ondelete='CASCADE', name='consultation_sessions_ibfk_1'),
-        Index('idx_cs_consultation', 'consultation_id')
+        Index('idx_cs_consultation_end', 'consultation_id', 'session_end', 'session_start'),
+        Index('uq_cs_active_consultation', 'active_consultation_id', unique=True)
     )
 
     session_id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -457,6 +460,7 @@ class ConsultationSessions(Base):
     total_tokens_used: Mapped[Optional[int]] = mapped_column(Integer, server_default=text("'0'"))
     total_api_calls: Mapped[Optional[int]] = mapped_column(Integer, server_default=text("'0'"))
     session_status: Mapped[Optional[str]] = mapped_column(String(50, 'utf8mb4_unicode_ci'), server_default=text("'active'"))
+    active_consultation_id: Mapped[Optional[int]] = mapped_column(Integer, Computed("(case when (`session_status` = 'active') then `consultation_id` end)", persisted=True))
     created_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, server_default=text('CURRENT_TIMESTAMP'))
 
     consultation: Mapped['Consultation'] = relationship('Consultation', back_populates='consultation_sessions')
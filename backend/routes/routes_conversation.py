@@ -1353,7 +1353,7 @@ async def save_conversation_transcript(
         if not transcript_text and session_db_id:
             transcript_text = await get_session_transcript_text(db, session_id=session_db_id)
         
-        if not transcript_text:
+        if not transcript_text or not transcript_text.strip():
             raise HTTPException(status_code=400, detail="No transcript text available")
         
         # Save to consultation_transcripts table
@@ -225,6 +225,68 @@ async def log_api_usage(
         )
 
 
+# ==========================================
+# SERVICE-SPECIFIC USAGE (service type, tokens, cost)
+# ==========================================
+# Pure builders shared by the log_* helpers below and by batched telemetry
+# writers that insert api_usage_logs rows themselves
+
+def openai_chat_usage(input_tokens: int, output_tokens: int) -> Dict[str, Any]:
+    return {
+        "service_type": "openai_chat",
+        "tokens_used": input_tokens + output_tokens,
+        "cost": (input_tokens / 1000 * 0.03) + (output_tokens / 1000 * 0.06),
+    }
+
+
+def deepgram_stt_usage(audio_duration_sec: float, transcript: str = "") -> Dict[str, Any]:
+    return {
+        "service_type": "deepgram_stt",
+        "tokens_used": len(transcript.split()) if transcript else 0,
+        "cost": (audio_duration_sec / 60) * 0.0043,
+    }
+
+
+def deepgram_tts_usage(text_length: int, audio_size: int) -> Dict[str, Any]:
+    return {
+        "service_type": "deepgram_tts",
+        "tokens_used": text_length,
+        "cost": (audio_size / 1000000) * 0.01,
+    }
+
+
+def sarvam_stt_usage(audio_duration_sec: float, transcript: str = "") -> Dict[str, Any]:
+    return {
+        "service_type": "sarvam_stt",
+        "tokens_used": len(transcript.split()) if transcript else 0,
+        "cost": (audio_duration_sec / 60) * 0.002,
+    }
+
+
+def sarvam_tts_usage(text_length: int, audio_size: int) -> Dict[str, Any]:
+    return {
+        "service_type": "sarvam_tts",
+        "tokens_used": text_length,
+        "cost": (audio_size / 1000000) * 0.005,
+    }
+
+
+def sarvam_translation_usage(input_length: int, output_length: int) -> Dict[str, Any]:
+    return {
+        "service_type": "sarvam_translation",
+        "tokens_used": input_length + output_length,
+        "cost": (input_length / 1000) * 0.001,
+    }
+
+
+def rag_retrieval_usage(context_length: int) -> Dict[str, Any]:
+    return {
+        "service_type": "rag_retrieval",
+        "tokens_used": context_length,
+        "cost": (context_length / 1000) * 0.001,
+    }
+
+
 # ==========================================
 # SERVICE-SPECIFIC LOGGING
 # ==========================================
@@ -243,23 +305,20 @@ async def log_openai_chat(
     transcript: str = ""
 ) -> None:
     """Log OpenAI chat API usage with token and cost calculation"""
-    total_tokens = input_tokens + output_tokens
-    cost = (input_tokens / 1000 * 0.03) + (output_tokens / 1000 * 0.06)
+    usage = openai_chat_usage(input_tokens, output_tokens)
     
-    logger.info(f"Logging OpenAI chat: tokens={total_tokens}, cost=${cost:.4f}, session_id={session_id}")
+    logger.info(f"Logging OpenAI chat: tokens={usage['tokens_used']}, cost=${usage['cost']:.4f}, session_id={session_id}")
     
     # Errors are handled by log_api_usage
     await log_api_usage(
         db,
-        service_type="openai_chat",
+        **usage,
         response_time_ms=response_time_ms,
         status=status,
         session_id=session_id,
         doctor_id=doctor_id,
         patient_id=patient_id,
         hospital_id=hospital_id,
-        tokens_used=total_tokens,
-        cost=cost,
         api_calls=1
     )
     
@@ -279,20 +338,18 @@ async def log_deepgram_stt(
     hospital_id: Optional[int] = None
 ) -> None:
     """Log Deepgram STT API usage with cost calculation"""
-    cost = (audio_duration_sec / 60) * 0.0043
-    logger.info(f"Logging Deepgram STT: duration={audio_duration_sec:.2f}s, cost=${cost:.4f}, session_id={session_id}")
+    usage = deepgram_stt_usage(audio_duration_sec, transcript)
+    logger.info(f"Logging Deepgram STT: duration={audio_duration_sec:.2f}s, cost=${usage['cost']:.4f}, session_id={session_id}")
     
     await log_api_usage(
         db,
-        service_type="deepgram_stt",
+        **usage,
         response_time_ms=response_time_ms,
         status=status,
         session_id=session_id,
         doctor_id=doctor_id,
         patient_id=patient_id,
         hospital_id=hospital_id,
-        tokens_used=len(transcript.split()) if transcript else 0,
-        cost=cost,
         api_calls=1
     )
     
@@ -312,19 +369,15 @@ async def log_deepgram_tts(
     hospital_id: Optional[int] = None
 ) -> None:
     """Log Deepgram TTS API usage"""
-    cost = (audio_size / 1000000) * 0.01
-    
     await log_api_usage(
         db,
-        service_type="deepgram_tts",
+        **deepgram_tts_usage(text_length, audio_size),
         response_time_ms=response_time_ms,
         status=status,
         session_id=session_id,
         doctor_id=doctor_id,
         patient_id=patient_id,
         hospital_id=hospital_id,
-        tokens_used=text_length,
-        cost=cost,
         api_calls=1
     )
 
@@ -342,20 +395,18 @@ async def log_sarvam_stt(
     hospital_id: Optional[int] = None
 ) -> None:
     """Log Sarvam STT API usage with cost calculation"""
-    cost = (audio_duration_sec / 60) * 0.002
-    logger.info(f"Logging Sarvam STT: duration={audio_duration_sec:.2f}s, cost=${cost:.4f}, session_id={session_id}")
+    usage = sarvam_stt_usage(audio_duration_sec, transcript)
+    logger.info(f"Logging Sarvam STT: duration={audio_duration_sec:.2f}s, cost=${usage['cost']:.4f}, session_id={session_id}")
     
     await log_api_usage(
         db,
-        service_type="sarvam_stt",
+        **usage,
         response_time_ms=response_time_ms,
         status=status,
         session_id=session_id,
         doctor_id=doctor_id,
         patient_id=patient_id,
         hospital_id=hospital_id,
-        tokens_used=len(transcript.split()) if transcript else 0,
-        cost=cost,
         api_calls=1
     )
     
@@ -375,19 +426,15 @@ async def log_sarvam_tts(
     hospital_id: Optional[int] = None
 ) -> None:
     """Log Sarvam TTS API usage"""
-    cost = (audio_size / 1000000) * 0.005
-    
     await log_api_usage(
         db,
-        service_type="sarvam_tts",
+        **sarvam_tts_usage(text_length, audio_size),
         response_time_ms=response_time_ms,
         status=status,
         session_id=session_id,
         doctor_id=doctor_id,
         patient_id=patient_id,
         hospital_id=hospital_id,
-        tokens_used=text_length,
-        cost=cost,
         api_calls=1
     )
 
@@ -405,19 +452,15 @@ async def log_sarvam_translation(
     hospital_id: Optional[int] = None
 ) -> None:
     """Log Sarvam Translation API usage"""
-    cost = (input_length / 1000) * 0.001
-    
     await log_api_usage(
         db,
-        service_type="sarvam_translation",
+        **sarvam_translation_usage(input_length, output_length),
         response_time_ms=response_time_ms,
         status=status,
         session_id=session_id,
         doctor_id=doctor_id,
         patient_id=patient_id,
         hospital_id=hospital_id,
-        tokens_used=input_length + output_length,
-        cost=cost,
         api_calls=1
     )
 
@@ -434,19 +477,15 @@ async def log_rag_retrieval(
     hospital_id: Optional[int] = None
 ) -> None:
     """Log RAG retrieval API usage"""
-    cost = (context_length / 1000) * 0.001
-    
     await log_api_usage(
         db,
-        service_type="rag_retrieval",
+        **rag_retrieval_usage(context_length),
         response_time_ms=response_time_ms,
         status=status,
         session_id=session_id,
         doctor_id=doctor_id,
         patient_id=patient_id,
         hospital_id=hospital_id,
-        tokens_used=context_length,
-        cost=cost,
         api_calls=1
     )
 
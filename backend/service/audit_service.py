@@ -41,10 +41,15 @@ async def create_audit_log(
     old_values: Optional[Dict[str, Any]] = None,
     new_values: Optional[Dict[str, Any]] = None,
     user_agent: Optional[str] = None,
+    commit: bool = True,
 ) -> None:
     """
     Best-effort audit logging - errors are logged but not raised
-    to avoid failing the main operation
+    to avoid failing the main operation.
+    
+    With commit=False the row is written inside a SAVEPOINT on the caller's
+    transaction and committed by the caller's own commit; a failed audit insert
+    rolls back only the savepoint, never the audited change.
     """
     try:
         row = AuditLogs(
@@ -56,6 +61,19 @@ async def create_audit_log(
             new_values=new_values,
             user_agent=user_agent,
         )
+        
+        if not commit:
+            try:
+                async with db.begin_nested():
+                    db.add(row)
+            except Exception as e:
+                logger.warning(f"Audit log write failed inside caller transaction (best-effort): {e}", extra={
+                    "event_type": event_type,
+                    "entity_type": entity_type,
+                    "entity_id": entity_id
+                })
+            return
+        
         db.add(row)
         
         # Flush with explicit exception handling (best-effort)
@@ -101,6 +119,6 @@ async def create_audit_log(
             "entity_type": entity_type,
             "entity_id": entity_id
         })
-        await _safe_rollback(db, "audit_logs")
-
-
+        # With commit=False the open transaction belongs to the caller; leave it alone
+        if commit:
+            await _safe_rollback(db, "audit_logs")
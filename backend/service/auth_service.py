@@ -2,7 +2,7 @@
 from typing import Tuple, Dict, Any
 from datetime import timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, bindparam
 from sqlalchemy.exc import (
     OperationalError,
     DisconnectionError
@@ -15,16 +15,73 @@ from centralisedErrorHandling.ErrorHandling import (
     UserNotFoundError,
     ConnectionError
 )
-from models.models import Users, RoleMaster
+from models.models import Users, RoleMaster, HospitalUserRoles, HospitalRole, HospitalMaster
 from config import settings
 import logging
+import time
 from google.oauth2 import id_token
 from google.auth.transport import requests
 
 logger = logging.getLogger(__name__)
 
-ACCESS_EXPIRE = getattr(settings, "ACCESS_TOKEN_EXPIRY_SECONDS", 4000)
-REFRESH_EXPIRE = getattr(settings, "JTI_EXPIRY_SECONDS", 3600)
+ACCESS_EXPIRE = int(getattr(settings, "ACCESS_TOKEN_EXPIRY_SECONDS", 4000))
+REFRESH_EXPIRE = int(getattr(settings, "JTI_EXPIRY_SECONDS", 3600))
+_ACCESS_TD = timedelta(seconds=ACCESS_EXPIRE)
+_REFRESH_TD = timedelta(seconds=REFRESH_EXPIRE)
+
+# Precomputed bcrypt_sha256 hash that is verified when no user matches the email,
+# so unknown accounts cost the same as a wrong password and cannot be told apart by timing.
+_DUMMY_HASH = "$bcrypt-sha256$v=2,t=2b,r=12$3cbBfMryCy7xiq2fPaMj6e$ZXKVfczZtS/KfC4jQ9dAU5f48MQddLe"
+
+class _CachedCertsRequest(requests.Request):
+    """google-auth transport that keeps successful GET responses (Google's signing certs) in memory."""
+
+    def __init__(self, ttl_seconds: int = 3600):
+        super().__init__()
+        self._ttl_seconds = ttl_seconds
+        self._cache = {}
+
+    def __call__(self, url, method="GET", body=None, headers=None, **kwargs):
+        if method != "GET" or body is not None:
+            return super().__call__(url, method=method, body=body, headers=headers, **kwargs)
+        cached = self._cache.get(url)
+        if cached and time.time() - cached[1] < self._ttl_seconds:
+            return cached[0]
+        response = super().__call__(url, method=method, body=body, headers=headers, **kwargs)
+        if response.status == 200:
+            self._cache[url] = (response, time.time())
+        return response
+
+
+# Shared across logins so verify_oauth2_token only fetches Google's certs once per hour
+_GOOGLE_REQUEST = _CachedCertsRequest()
+
+# Login lookups built once with bind parameters so their compiled SQL is reused on every call
+_LOGIN_USER_BY_EMAIL = select(
+    Users.user_id,
+    Users.username,
+    Users.email,
+    Users.password_hash,
+    Users.global_role_id,
+).where(Users.email == bindparam("email"))
+_USER_BY_EMAIL = select(Users).where(Users.email == bindparam("email"))
+_ROLE_BY_ID = select(RoleMaster).where(RoleMaster.role_id == bindparam("role_id"))
+_ACTIVE_HOSPITAL_ROLES_BY_USER = (
+    select(
+        HospitalUserRoles.hospital_id,
+        HospitalMaster.hospital_name,
+        HospitalUserRoles.hospital_role_id,
+        HospitalRole.role_name,
+    )
+    .join(HospitalRole, HospitalRole.hospital_role_id == HospitalUserRoles.hospital_role_id)
+    .join(HospitalMaster, HospitalMaster.hospital_id == HospitalUserRoles.hospital_id)
+    .where(
+        and_(
+            HospitalUserRoles.user_id == bindparam("user_id"),
+            HospitalUserRoles.is_active == 1
+        )
+    )
+)
 
 
 async def revoke_jti(jti: str) -> None:
@@ -34,7 +91,7 @@ async def revoke_jti(jti: str) -> None:
         await add_jti_to_blocklist(jti)
     except Exception as e:
         # bubble up as domain error so central handler can decide
-        logger.error(f"Failed to revoke JTI: {e}")
+        logger.error("Failed to revoke JTI: %s", e)
         raise DatabaseError(
             "Failed to revoke token",
             operation="redis.set",
@@ -64,7 +121,7 @@ async def refresh_token_pair(db: AsyncSession, refresh_token_data: Dict[str, Any
     try:
         user = await db.get(Users, int(user_id))
     except (DisconnectionError, OperationalError) as e:
-        logger.error(f"Database connection error during token refresh: {e}")
+        logger.error("Database connection error during token refresh: %s", e)
         raise ConnectionError(
             "Database connection failed during token refresh",
             operation="refresh_token_user_lookup",
@@ -72,7 +129,7 @@ async def refresh_token_pair(db: AsyncSession, refresh_token_data: Dict[str, Any
             context={"table": "users", "user_id": user_id}
         )
     except Exception as e:
-        logger.error(f"Unexpected error verifying user during token refresh: {e}")
+        logger.error("Unexpected error verifying user during token refresh: %s", e)
         raise DatabaseError(
             "DB error while verifying user during token refresh",
             operation="select",
@@ -81,39 +138,36 @@ async def refresh_token_pair(db: AsyncSession, refresh_token_data: Dict[str, Any
             context={"user_id": user_id}
         )
     if not user:
-        logger.warning(f"User not found for refresh: user_id={user_id}")
+        logger.warning("User not found for refresh: user_id=%s", user_id)
         raise UserNotFoundError(
             "User not found for refresh",
             user_id=user_id,
             context={"operation": "refresh_token"}
         )
 
-    # Revoke old refresh token jti (best-effort)
+    # Revoke old refresh token jti (best-effort) before any new token is issued
     if jti_old:
         try:
             await revoke_jti(jti_old)
-        except DatabaseError:
-            pass
+        except Exception as e:
+            logger.warning("Could not revoke refresh token during refresh: %s", e)
 
     # Build fresh comprehensive user payload
     new_user_payload = await build_token_user_payload(db, user)
 
-    access_exp = int(getattr(settings, "ACCESS_TOKEN_EXPIRY_SECONDS", ACCESS_EXPIRE))
-    refresh_exp = int(getattr(settings, "JTI_EXPIRY_SECONDS", REFRESH_EXPIRE))
-
-    new_access = create_access_token(new_user_payload, expiry=timedelta(seconds=access_exp), refresh=False)
-    new_refresh = create_access_token(new_user_payload, expiry=timedelta(seconds=refresh_exp), refresh=True)
+    new_access = create_access_token(new_user_payload, expiry=_ACCESS_TD, refresh=False)
+    new_refresh = create_access_token(new_user_payload, expiry=_REFRESH_TD, refresh=True)
 
-    return new_access, new_refresh, access_exp
+    return new_access, new_refresh, ACCESS_EXPIRE
 
 
 async def authenticate_user(db: AsyncSession, email: str, password: str) -> Tuple[str, str, int]:
     try:
-        q = select(Users).where(Users.email == email)
-        result = await db.execute(q)
-        user = result.scalar_one_or_none()
+        # Only the columns needed for login; the Row supports attribute access like the ORM object
+        result = await db.execute(_LOGIN_USER_BY_EMAIL, {"email": email})
+        user = result.first()
     except (DisconnectionError, OperationalError) as e:
-        logger.error(f"Database connection error during authentication: {e}")
+        logger.error("Database connection error during authentication: %s", e)
         raise ConnectionError(
             "Database connection failed during authentication",
             operation="authenticate_user_lookup",
@@ -121,7 +175,7 @@ async def authenticate_user(db: AsyncSession, email: str, password: str) -> Tupl
             context={"table": "users", "email": email}
         )
     except Exception as e:
-        logger.error(f"Unexpected error during authentication: {e}")
+        logger.error("Unexpected error during authentication: %s", e)
         raise DatabaseError(
             "Database error during authentication",
             operation="select",
@@ -130,8 +184,14 @@ async def authenticate_user(db: AsyncSession, email: str, password: str) -> Tupl
             context={"email": email}
         )
     
-    if not user or not verify_password(password, user.password_hash):
-        logger.warning(f"Authentication failed for email: {email}")
+    if user is None:
+        verify_password(password, _DUMMY_HASH)
+        authenticated = False
+    else:
+        authenticated = verify_password(password, user.password_hash)
+
+    if not authenticated:
+        logger.warning("Authentication failed for email: %s", email)
         raise AuthenticationError(
             "Invalid email or password",
             username=email,
@@ -139,65 +199,52 @@ async def authenticate_user(db: AsyncSession, email: str, password: str) -> Tupl
             context={"email": email}
         )
 
-    user_payload = {
-        "user_id": user.user_id,
-        "username": user.username,
-        "email": user.email
-    }
-    
-
+    global_role = None
+    global_role_scope = None
     if user.global_role_id:
-        role_q = select(RoleMaster).where(RoleMaster.role_id == user.global_role_id)
-        role_result = await db.execute(role_q)
+        role_result = await db.execute(_ROLE_BY_ID, {"role_id": user.global_role_id})
         role = role_result.scalar_one_or_none()
         if role:
-            user_payload["global_role"] = {
+            global_role_scope = role.role_scope
+            global_role = {
                 "role_id": role.role_id,
                 "role_name": role.role_name
             }
     
-    # Add hospital roles to JWT payload
-    try:
-        from models.models import HospitalUserRoles, HospitalRole, HospitalMaster
-        hospital_roles_query = (
-            select(HospitalUserRoles, HospitalRole, HospitalMaster)
-            .join(HospitalRole, HospitalRole.hospital_role_id == HospitalUserRoles.hospital_role_id)
-            .join(HospitalMaster, HospitalMaster.hospital_id == HospitalUserRoles.hospital_id)
-            .where(
-                and_(
-                    HospitalUserRoles.user_id == user.user_id,
-                    HospitalUserRoles.is_active == 1
-                )
-            )
-        )
-        hospital_roles_result = await db.execute(hospital_roles_query)
-        hospital_roles = hospital_roles_result.all()
-        
-        if hospital_roles:
-            user_payload["hospital_roles"] = [
+    # Add hospital roles to JWT payload. Platform-scoped global roles (superadmin) are never
+    # mapped to a hospital and skip the JOIN; tenant roles, patients included, can be.
+    hospital_roles = []
+    if global_role_scope != "platform":
+        try:
+            hospital_roles_result = await db.execute(_ACTIVE_HOSPITAL_ROLES_BY_USER, {"user_id": user.user_id})
+            hospital_roles = [
                 {
-                    "hospital_id": hur.HospitalUserRoles.hospital_id,
-                    "hospital_name": hur.HospitalMaster.hospital_name,
-                    "role_id": hur.HospitalUserRoles.hospital_role_id,
-                    "role_name": hur.HospitalRole.role_name
+                    "hospital_id": hospital_id,
+                    "hospital_name": hospital_name,
+                    "role_id": role_id,
+                    "role_name": role_name
                 }
-                for hur in hospital_roles
+                for hospital_id, hospital_name, role_id, role_name in hospital_roles_result.all()
             ]
-            # For convenience, add the first hospital_id to the root level
-            if hospital_roles:
-                user_payload["hospital_id"] = hospital_roles[0].HospitalUserRoles.hospital_id
-    except Exception as e:
-        logger.warning(f"Failed to fetch hospital roles for user {user.user_id}: {e}")
-        # Continue without hospital roles
-    
+        except Exception as e:
+            logger.warning("Failed to fetch hospital roles for user %s: %s", user.user_id, e)
+            # Continue without hospital roles
 
-    access_exp = int(getattr(settings, "ACCESS_TOKEN_EXPIRY_SECONDS", ACCESS_EXPIRE))
-    refresh_exp = int(getattr(settings, "JTI_EXPIRY_SECONDS", REFRESH_EXPIRE))
-    
-    access_token = create_access_token(user_payload, expiry=timedelta(seconds=access_exp), refresh=False)
-    refresh_token = create_access_token(user_payload, expiry=timedelta(seconds=refresh_exp), refresh=True)
+    # Built in one literal once all parts are known
+    user_payload = {
+        "user_id": user.user_id,
+        "username": user.username,
+        "email": user.email,
+        "global_role": global_role,
+        "hospital_roles": hospital_roles,
+        # For convenience, add the first hospital_id to the root level
+        "hospital_id": hospital_roles[0]["hospital_id"] if hospital_roles else None,
+    }
+
+    access_token = create_access_token(user_payload, expiry=_ACCESS_TD, refresh=False)
+    refresh_token = create_access_token(user_payload, expiry=_REFRESH_TD, refresh=True)
     
-    return access_token, refresh_token, access_exp
+    return access_token, refresh_token, ACCESS_EXPIRE
 
 
 async def authenticate_google_user(db: AsyncSession, google_token: str) -> Tuple[str, str, int]:
@@ -210,7 +257,7 @@ async def authenticate_google_user(db: AsyncSession, google_token: str) -> Tuple
         # This handles minor time synchronization differences between client and server
         idinfo = id_token.verify_oauth2_token(
             google_token, 
-            requests.Request(), 
+            _GOOGLE_REQUEST, 
             settings.GOOGLE_CLIENT_ID,
             clock_skew_in_seconds=10
         )
@@ -224,8 +271,7 @@ async def authenticate_google_user(db: AsyncSession, google_token: str) -> Tuple
             raise AuthenticationError("No email found in Google token")
         
         # Check if user exists in database
-        q = select(Users).where(Users.email == google_email)
-        result = await db.execute(q)
+        result = await db.execute(_USER_BY_EMAIL, {"email": google_email})
         user = result.scalar_one_or_none()
         
         if not user:
@@ -238,25 +284,23 @@ async def authenticate_google_user(db: AsyncSession, google_token: str) -> Tuple
                 is_active=True
             )
             db.add(user)
+            # user_id is populated from the INSERT itself and the session does not
+            # expire on commit, so no refresh SELECT is needed before building the payload
             await db.commit()
-            await db.refresh(user)
         
         # Build user payload
         user_payload = await build_token_user_payload(db, user)
         
-        access_exp = int(getattr(settings, "ACCESS_TOKEN_EXPIRY_SECONDS", ACCESS_EXPIRE))
-        refresh_exp = int(getattr(settings, "JTI_EXPIRY_SECONDS", REFRESH_EXPIRE))
-        
-        access_token = create_access_token(user_payload, expiry=timedelta(seconds=access_exp), refresh=False)
-        refresh_token = create_access_token(user_payload, expiry=timedelta(seconds=refresh_exp), refresh=True)
+        access_token = create_access_token(user_payload, expiry=_ACCESS_TD, refresh=False)
+        refresh_token = create_access_token(user_payload, expiry=_REFRESH_TD, refresh=True)
         
-        return access_token, refresh_token, access_exp
+        return access_token, refresh_token, ACCESS_EXPIRE
         
     except ValueError as e:
-        logger.error(f"Invalid Google token: {e}")
+        logger.error("Invalid Google token: %s", e)
         raise AuthenticationError("Invalid Google token")
     except Exception as e:
-        logger.error(f"Google authentication error: {e}")
+        logger.error("Google authentication error: %s", e)
         raise AuthenticationError("Google authentication failed")
 
 
@@ -264,21 +308,20 @@ async def build_token_user_payload(db: AsyncSession, user: Users) -> Dict[str, A
     """
     Build comprehensive user payload for JWT tokens with hospital roles and permissions.
     """
-    user_payload = {
-        "user_id": user.user_id,
-        "username": user.username,
-        "email": user.email
-    }
-    
     # Add global role information
+    global_role = None
     if user.global_role_id:
-        role_q = select(RoleMaster).where(RoleMaster.role_id == user.global_role_id)
-        role_result = await db.execute(role_q)
+        role_result = await db.execute(_ROLE_BY_ID, {"role_id": user.global_role_id})
         role = role_result.scalar_one_or_none()
         if role:
-            user_payload["global_role"] = {
+            global_role = {
                 "role_id": role.role_id,
                 "role_name": role.role_name
             }
     
-    return user_payload
+    return {
+        "user_id": user.user_id,
+        "username": user.username,
+        "email": user.email,
+        "global_role": global_role,
+    }
@@ -1,17 +1,28 @@
 from typing import Optional
+import asyncio
 import datetime
+import io
 import logging
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import wraps
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import update
+from sqlalchemy.orm import load_only, raiseload
+from sqlalchemy import select, update, insert, func, bindparam, case, text
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.exc import (
     IntegrityError,
     OperationalError,
     DBAPIError,
     DatabaseError as SQLAlchemyDatabaseError,
     InvalidRequestError,
-    DisconnectionError
+    DisconnectionError,
+    SQLAlchemyError
 )
 
+from database.database import AsyncSessionLocal
 from models.models import (
     Consultation,
     ConsultationSessions,
@@ -21,17 +32,107 @@ from models.models import (
 )
 
 from service.audit_service import create_audit_log as _create_audit_log
+from service.analytics_service import (
+    openai_chat_usage,
+    sarvam_translation_usage,
+    rag_retrieval_usage,
+    deepgram_stt_usage,
+    sarvam_stt_usage,
+    deepgram_tts_usage,
+    sarvam_tts_usage,
+)
 from centralisedErrorHandling.ErrorHandling import (
     DatabaseError,
     SessionError,
     TransactionError,
     ConnectionError,
     DataIntegrityError,
-    ResourceNotFoundError
+    ResourceNotFoundError,
+    UserServiceError
 )
 
 logger = logging.getLogger(__name__)
 
+# Core INSERTs against the tables themselves: message and usage rows skip ORM
+# unit-of-work / bulk-insert bookkeeping and go straight to the driver
+_INSERT_MESSAGES = insert(ConsultationMessages.__table__)
+_INSERT_API_USAGE = insert(ApiUsageLogs.__table__)
+
+# Hot UPDATE statement built once; callers only bind parameters
+_UPDATE_CONSULTATION_STATUS = (
+    update(Consultation)
+    .where(Consultation.consultation_id == bindparam("cid"))
+    .values(status=bindparam("status"))
+)
+_UPDATE_CONSULTATION_STATUS_DURATION = _UPDATE_CONSULTATION_STATUS.values(
+    total_duration=bindparam("total_duration")
+)
+
+# Session length in seconds, computed from the stored DATETIMEs without a per-row
+# UNIX_TIMESTAMP time zone conversion; served by idx_cs_consultation_end
+_session_seconds = func.timestampdiff(
+    text("SECOND"), ConsultationSessions.session_start, ConsultationSessions.session_end
+)
+
+# Consultation duration refresh: the ended sessions are summed in a correlated
+# subquery so the UPDATE is the only round-trip
+_UPDATE_CONSULTATION_DURATION = (
+    update(Consultation)
+    .where(Consultation.consultation_id == bindparam("cid"))
+    .values(
+        total_duration=select(func.coalesce(func.sum(_session_seconds), 0))
+        .where(
+            ConsultationSessions.consultation_id == Consultation.consultation_id,
+            ConsultationSessions.session_end.isnot(None)
+        )
+        .scalar_subquery()
+    )
+    .execution_options(synchronize_session=False)
+)
+
+# Session usage counters are bumped with a single atomic UPDATE per call, so concurrent
+# writers in any worker add to the stored value instead of overwriting it
+_INCREMENT_SESSION_STATS = (
+    update(ConsultationSessions)
+    .where(ConsultationSessions.session_id == bindparam("sid"))
+    .values(
+        total_tokens_used=ConsultationSessions.total_tokens_used + bindparam("tokens"),
+        total_api_calls=ConsultationSessions.total_api_calls + bindparam("calls"),
+    )
+    .execution_options(synchronize_session=False)
+)
+
+# Transient (connection/operational) failures are retried this many times in total
+_TRANSIENT_ATTEMPTS = 3
+_RETRY_BASE_DELAY = 0.1
+
+# doctor/patient/hospital ids per consultation for API usage logging; they never change
+# for a consultation, so cache them for a while instead of selecting on every call.
+# Entries stay in insertion (and so expiry) order, which lets each insert prune expired
+# entries from the front and evict the oldest once the cache holds _CONSULTATION_IDS_MAX
+_CONSULTATION_IDS_TTL = 300
+_CONSULTATION_IDS_MAX = 10000
+_consultation_ids_cache: dict = {}
+
+# Consultation columns the route callers of get_consultation_details actually read
+_CONSULTATION_DETAIL_COLUMNS = (
+    Consultation.consultation_id,
+    Consultation.patient_id,
+    Consultation.doctor_id,
+    Consultation.specialty_id,
+    Consultation.hospital_id,
+    Consultation.consultation_type,
+    Consultation.status,
+)
+
+# STT usage builders by provider name
+_STT_USAGE = {"deepgram": deepgram_stt_usage, "sarvam": sarvam_stt_usage}
+
+# Transcript speaker labels; any sender other than the patient is rendered as the doctor
+_TRANSCRIPT_SENDER_LABELS = {"patient": "Patient"}
+# Rows fetched per round-trip when streaming a session transcript
+_TRANSCRIPT_YIELD_PER = 500
+
 
 async def _safe_rollback(db: AsyncSession, table_name: str) -> None:
     """Safely attempt database rollback with error handling"""
@@ -47,6 +148,58 @@ async def _safe_rollback(db: AsyncSession, table_name: str) -> None:
         # Don't raise - we're already in error handling
 
 
+def _transient_backoff(attempt: int) -> float:
+    """Exponential backoff with up to 50% jitter so retrying workers do not reconnect in lockstep"""
+    return _RETRY_BASE_DELAY * (2 ** attempt) * (1 + random.random() * 0.5)
+
+
+def _db_guard(table: str, operation: str, action: str, *, retry: bool = False):
+    """Roll back and map failures raised by a service call to DatabaseError.
+    
+    With retry=True, connection/operational errors are retried with backoff up to
+    _TRANSIENT_ATTEMPTS times. Only pass it for reads and idempotent updates: a
+    dropped connection after a commit reached the server would otherwise replay
+    an INSERT. Integrity errors are deterministic and fail immediately. Service
+    errors raised by the wrapped function pass through unchanged.
+    """
+    attempts = _TRANSIENT_ATTEMPTS if retry else 1
+    
+    def decorator(fn):
+        @wraps(fn)
+        async def wrapper(db: AsyncSession, *args, **kwargs):
+            for attempt in range(attempts):
+                try:
+                    return await fn(db, *args, **kwargs)
+                except UserServiceError:
+                    raise
+                except IntegrityError as e:
+                    logger.error("Integrity error in %s: %s", fn.__name__, e)
+                    await _safe_rollback(db, table)
+                    raise DatabaseError("Foreign key or constraint violation", operation=operation, table=table, original_error=e)
+                except (DisconnectionError, OperationalError) as e:
+                    await _safe_rollback(db, table)
+                    if attempt < attempts - 1:
+                        wait_time = _transient_backoff(attempt)
+                        logger.warning(
+                            "Transient database error in %s, retrying in %.2fs (attempt %s/%s): %s",
+                            fn.__name__, wait_time, attempt + 1, attempts, e
+                        )
+                        await asyncio.sleep(wait_time)
+                        continue
+                    logger.error("Database operational error in %s: %s", fn.__name__, e)
+                    raise DatabaseError("Database connection or operational error", operation=operation, table=table, original_error=e)
+                except SQLAlchemyDatabaseError as e:
+                    logger.error("SQLAlchemy database error in %s: %s", fn.__name__, e)
+                    await _safe_rollback(db, table)
+                    raise DatabaseError(f"Database error during {action}", operation=operation, table=table, original_error=e)
+                except Exception as e:
+                    logger.error("Unexpected error in %s: %s", fn.__name__, e, exc_info=True)
+                    await _safe_rollback(db, table)
+                    raise DatabaseError(f"Unexpected error during {action}", operation=operation, table=table, original_error=e)
+        return wrapper
+    return decorator
+
+
 async def create_consultation(
     db: AsyncSession,
     *,
@@ -58,7 +211,9 @@ async def create_consultation(
 ) -> int:
     """Create a new consultation record"""
     try:
-        consult = Consultation(
+        # Core INSERT: the new id comes back with the statement itself (cursor lastrowid),
+        # so there is no flush + refresh SELECT before the commit
+        stmt = insert(Consultation).values(
             patient_id=int(patient_id),
             doctor_id=int(doctor_id),
             specialty_id=int(specialty_id),
@@ -67,14 +222,13 @@ async def create_consultation(
             status="Active",
             total_duration=0
         )
-        db.add(consult)
         
-        # Flush with explicit exception handling
+        # Insert with explicit exception handling
         try:
-            await db.flush()
+            result = await db.execute(stmt)
         except IntegrityError as e:
             await _safe_rollback(db, "consultation")
-            logger.error(f"Integrity error during consultation flush: {e}")
+            logger.error(f"Integrity error during consultation insert: {e}")
             raise DataIntegrityError(
                 "Foreign key or unique constraint violation during consultation creation",
                 constraint_type="foreign_key",
@@ -83,17 +237,17 @@ async def create_consultation(
                 value={"patient_id": patient_id, "doctor_id": doctor_id, "specialty_id": specialty_id},
                 original_error=e,
                 context={
-                    "operation": "create_consultation_flush",
+                    "operation": "create_consultation_insert",
                     "hospital_id": hospital_id,
                     "consultation_type": consultation_type
                 }
             )
         except (DisconnectionError, OperationalError) as e:
             await _safe_rollback(db, "consultation")
-            logger.error(f"Database connection error during consultation flush: {e}")
+            logger.error(f"Database connection error during consultation insert: {e}")
             raise ConnectionError(
                 "Database connection failed during consultation creation",
-                operation="create_consultation_flush",
+                operation="create_consultation_insert",
                 original_error=e,
                 context={
                     "table": "consultation",
@@ -104,12 +258,12 @@ async def create_consultation(
             )
         except InvalidRequestError as e:
             await _safe_rollback(db, "consultation")
-            logger.error(f"Invalid session state during consultation flush: {e}")
+            logger.error(f"Invalid session state during consultation insert: {e}")
             raise TransactionError(
                 "Session state error during consultation creation",
-                operation="create_consultation_flush",
+                operation="create_consultation_insert",
                 table="consultation",
-                transaction_state="flush_failed",
+                transaction_state="insert_failed",
                 original_error=e,
                 context={
                     "patient_id": patient_id,
@@ -118,41 +272,11 @@ async def create_consultation(
                 }
             )
         
-        # Refresh with explicit exception handling
-        try:
-            await db.refresh(consult)
-        except InvalidRequestError as e:
-            await _safe_rollback(db, "consultation")
-            logger.error(f"Invalid session state during consultation refresh: {e}")
-            raise TransactionError(
-                "Session state error during consultation refresh",
-                operation="create_consultation_refresh",
-                table="consultation",
-                transaction_state="refresh_failed",
-                original_error=e,
-                context={
-                    "patient_id": patient_id,
-                    "doctor_id": doctor_id
-                }
-            )
-        except (DisconnectionError, OperationalError) as e:
-            await _safe_rollback(db, "consultation")
-            logger.error(f"Database connection error during consultation refresh: {e}")
-            raise ConnectionError(
-                "Database connection failed during consultation refresh",
-                operation="create_consultation_refresh",
-                original_error=e,
-                context={
-                    "table": "consultation",
-                    "patient_id": patient_id,
-                    "doctor_id": doctor_id
-                }
-            )
-        
+        consultation_id = int(result.inserted_primary_key[0])
         await db.commit()
         
-        logger.info(f"Created consultation {consult.consultation_id} for patient {patient_id}")
-        return int(consult.consultation_id)
+        logger.info(f"Created consultation {consultation_id} for patient {patient_id}")
+        return consultation_id
     
     except IntegrityError as e:
         await _safe_rollback(db, "consultation")
@@ -178,14 +302,14 @@ async def create_consultation(
         logger.error(f"Invalid session state in create_consultation: {e}")
         raise TransactionError(
             "Session state error during consultation creation",
-            operation="flush/refresh",
+            operation="insert/commit",
             table="consultation",
             original_error=e
         )
     
-    except Exception as e:
+    except (SQLAlchemyError, asyncio.TimeoutError) as e:
         await _safe_rollback(db, "consultation")
-        logger.error(f"Unexpected error in create_consultation: {e}", exc_info=True)
+        logger.error(f"Unexpected error in create_consultation: {e}", exc_info=logger.isEnabledFor(logging.DEBUG))
         raise DatabaseError(
             "Unexpected error during consultation creation",
             operation="insert",
@@ -202,39 +326,26 @@ async def get_or_create_session(
 ) -> int:
     """Get existing active session or create new one to prevent multiple sessions"""
     try:
-        from sqlalchemy import select
-        
-        # Check if there's an active session for this consultation
-        result = await db.execute(
-            select(ConsultationSessions)
-            .where(
-                ConsultationSessions.consultation_id == consultation_id,
-                ConsultationSessions.session_status == "active"
-            )
-            .order_by(ConsultationSessions.created_at.desc())
-        )
-        existing_session = result.scalar_one_or_none()
-        
-        if existing_session:
-            logger.debug(f"Reusing existing session {existing_session.session_id} for consultation {consultation_id}")
-            return int(existing_session.session_id)
-        
-        # Create new session if none exists
-        session = ConsultationSessions(
+        # uq_cs_active_consultation allows one active session per consultation, so a
+        # concurrent create collides on the key and LAST_INSERT_ID(session_id) hands
+        # back the session that already exists instead of inserting a duplicate
+        stmt = mysql_insert(ConsultationSessions).values(
             consultation_id=int(consultation_id),
             session_type=session_type,
             session_status="active",
             total_tokens_used=0,
             total_api_calls=0
         )
-        db.add(session)
+        stmt = stmt.on_duplicate_key_update(
+            session_id=func.last_insert_id(ConsultationSessions.session_id)
+        )
         
-        # Flush with explicit exception handling
+        # Insert with explicit exception handling
         try:
-            await db.flush()
+            result = await db.execute(stmt)
         except IntegrityError as e:
             await _safe_rollback(db, "consultation_sessions")
-            logger.error(f"Integrity error during session flush: {e}")
+            logger.error(f"Integrity error during session insert: {e}")
             raise DataIntegrityError(
                 "Foreign key violation - consultation may not exist",
                 constraint_type="foreign_key",
@@ -243,16 +354,16 @@ async def get_or_create_session(
                 value=consultation_id,
                 original_error=e,
                 context={
-                    "operation": "get_or_create_session_flush",
+                    "operation": "get_or_create_session_insert",
                     "session_type": session_type
                 }
             )
         except (DisconnectionError, OperationalError) as e:
             await _safe_rollback(db, "consultation_sessions")
-            logger.error(f"Database connection error during session flush: {e}")
+            logger.error(f"Database connection error during session insert: {e}")
             raise ConnectionError(
                 "Database connection failed during session creation",
-                operation="get_or_create_session_flush",
+                operation="get_or_create_session_insert",
                 original_error=e,
                 context={
                     "table": "consultation_sessions",
@@ -262,52 +373,25 @@ async def get_or_create_session(
             )
         except InvalidRequestError as e:
             await _safe_rollback(db, "consultation_sessions")
-            logger.error(f"Invalid session state during session flush: {e}")
+            logger.error(f"Invalid session state during session insert: {e}")
             raise SessionError(
                 "Session state error during session creation",
                 consultation_id=consultation_id,
                 session_status="active",
                 original_error=e,
                 context={
-                    "operation": "get_or_create_session_flush",
-                    "session_type": session_type
-                }
-            )
-        
-        # Refresh with explicit exception handling
-        try:
-            await db.refresh(session)
-        except InvalidRequestError as e:
-            await _safe_rollback(db, "consultation_sessions")
-            logger.error(f"Invalid session state during session refresh: {e}")
-            raise SessionError(
-                "Session state error during session refresh",
-                consultation_id=consultation_id,
-                session_status="active",
-                original_error=e,
-                context={
-                    "operation": "get_or_create_session_refresh",
-                    "session_type": session_type
-                }
-            )
-        except (DisconnectionError, OperationalError) as e:
-            await _safe_rollback(db, "consultation_sessions")
-            logger.error(f"Database connection error during session refresh: {e}")
-            raise ConnectionError(
-                "Database connection failed during session refresh",
-                operation="get_or_create_session_refresh",
-                original_error=e,
-                context={
-                    "table": "consultation_sessions",
-                    "consultation_id": consultation_id,
+                    "operation": "get_or_create_session_insert",
                     "session_type": session_type
                 }
             )
         
+        session_id = int(result.lastrowid)
         await db.commit()
         
-        logger.info(f"Created new session {session.session_id} for consultation {consultation_id}")
-        return int(session.session_id)
+        # rowcount cannot tell an insert from a reused row here (CLIENT_FOUND_ROWS reports
+        # a matched duplicate as 1), so the log does not claim either
+        logger.debug("Using active session %s for consultation %s", session_id, consultation_id)
+        return session_id
     
     except IntegrityError as e:
         await _safe_rollback(db, "consultation_sessions")
@@ -337,9 +421,9 @@ async def get_or_create_session(
             original_error=e
         )
     
-    except Exception as e:
+    except (SQLAlchemyError, asyncio.TimeoutError) as e:
         await _safe_rollback(db, "consultation_sessions")
-        logger.error(f"Unexpected error in get_or_create_session: {e}", exc_info=True)
+        logger.error(f"Unexpected error in get_or_create_session: {e}", exc_info=logger.isEnabledFor(logging.DEBUG))
         raise DatabaseError(
             "Unexpected error during session creation",
             operation="insert",
@@ -348,14 +432,8 @@ async def get_or_create_session(
         )
 
 
-async def open_session(
-    db: AsyncSession,
-    *,
-    consultation_id: int,
-    session_type: str = "text",
-) -> int:
-    """Legacy function - now uses get_or_create_session to prevent duplicates"""
-    return await get_or_create_session(db, consultation_id=consultation_id, session_type=session_type)
+# Legacy name - uses get_or_create_session to prevent duplicates
+open_session = get_or_create_session
 
 
 async def close_session(
@@ -366,16 +444,18 @@ async def close_session(
 ) -> None:
     """Close a consultation session and update consultation duration"""
     try:
-        from sqlalchemy import select, func
+        sid = int(session_id)
         
-        # Get consultation_id for this session
-        result = await db.execute(
-            select(ConsultationSessions.consultation_id)
-            .where(ConsultationSessions.session_id == int(session_id))
+        # Close the session using database server time to avoid timezone mismatch;
+        # a zero rowcount means the session does not exist
+        q = (
+            update(ConsultationSessions)
+            .where(ConsultationSessions.session_id == sid)
+            .values(session_end=func.now(), session_status=status)
         )
-        consultation_id = result.scalar_one_or_none()
+        result = await db.execute(q)
         
-        if not consultation_id:
+        if not result.rowcount:
             logger.warning(f"Session {session_id} not found or has no consultation_id")
             raise ResourceNotFoundError(
                 f"Session {session_id} not found",
@@ -383,52 +463,43 @@ async def close_session(
                 resource_id=session_id
             )
         
-        # Close the session using database server time to avoid timezone mismatch
-        q = (
-            update(ConsultationSessions)
-            .where(ConsultationSessions.session_id == int(session_id))
-            .values(session_end=func.now(), session_status=status)
-        )
-        await db.execute(q)
-        
-        # Update consultation duration (MySQL-compatible timestamp difference)
-        result = await db.execute(
-            select(func.sum(
-                func.unix_timestamp(ConsultationSessions.session_end) - 
-                func.unix_timestamp(ConsultationSessions.session_start)
-            ).label('total_seconds'))
+        # Recompute duration and status for the owning consultation in the same statement:
+        # total of closed session durations, and 'completed' once no active sessions remain
+        total_seconds = (
+            select(func.coalesce(func.sum(_session_seconds), 0))
             .where(
-                ConsultationSessions.consultation_id == int(consultation_id),
+                ConsultationSessions.consultation_id == Consultation.consultation_id,
                 ConsultationSessions.session_end.isnot(None)
             )
+            .scalar_subquery()
         )
-        total_seconds = result.scalar() or 0
-        
-        # Check if all sessions are completed/closed
-        result = await db.execute(
+        active_sessions_count = (
             select(func.count(ConsultationSessions.session_id))
             .where(
-                ConsultationSessions.consultation_id == int(consultation_id),
+                ConsultationSessions.consultation_id == Consultation.consultation_id,
                 ConsultationSessions.session_status == "active"
             )
+            .scalar_subquery()
+        )
+        owning_consultation_id = (
+            select(ConsultationSessions.consultation_id)
+            .where(ConsultationSessions.session_id == sid)
+            .scalar_subquery()
         )
-        active_sessions_count = result.scalar() or 0
-        
-        # Update consultation status to completed if no active sessions remain
-        consultation_status = "completed" if active_sessions_count == 0 else "Active"
         
         q2 = (
             update(Consultation)
-            .where(Consultation.consultation_id == int(consultation_id))
+            .where(Consultation.consultation_id == owning_consultation_id)
             .values(
-                total_duration=int(total_seconds),
-                status=consultation_status
+                total_duration=total_seconds,
+                status=case((active_sessions_count == 0, "completed"), else_="Active")
             )
+            .execution_options(synchronize_session=False)
         )
         await db.execute(q2)
         await db.commit()
         
-        logger.info(f"Successfully closed session {session_id} with status '{status}', consultation status updated to '{consultation_status}'")
+        logger.info(f"Successfully closed session {session_id} with status '{status}' and refreshed consultation duration/status")
     
     except IntegrityError as e:
         await _safe_rollback(db, "consultation_sessions")
@@ -463,9 +534,9 @@ async def close_session(
         # Re-raise resource not found as-is
         raise
     
-    except Exception as e:
+    except (SQLAlchemyError, asyncio.TimeoutError) as e:
         await _safe_rollback(db, "consultation_sessions")
-        logger.error(f"Unexpected error in close_session: {e}", exc_info=True)
+        logger.error(f"Unexpected error in close_session: {e}", exc_info=logger.isEnabledFor(logging.DEBUG))
         raise DatabaseError(
             "Unexpected error during session close",
             operation="update",
@@ -474,6 +545,7 @@ async def close_session(
         )
 
 
+@_db_guard("consultation", "update", "status update", retry=True)
 async def update_consultation_status(
     db: AsyncSession,
     *,
@@ -482,53 +554,18 @@ async def update_consultation_status(
     total_duration: Optional[int] = None,
 ) -> None:
     """Update consultation status and total duration using existing fields"""
-    try:
-        update_values = {"status": status}
-        if total_duration is not None:
-            update_values["total_duration"] = total_duration
-            
-        q = (
-            update(Consultation)
-            .where(Consultation.consultation_id == int(consultation_id))
-            .values(**update_values)
-        )
-        
-        try:
-            await db.execute(q)
-        except (DisconnectionError, OperationalError) as e:
-            logger.error(f"Database connection error during consultation status update: {e}")
-            await _safe_rollback(db, "consultation")
-            raise DatabaseError("Database connection failed during status update", operation="update", table="consultation", original_error=e)
-        
-        try:
-            await db.commit()
-            logger.info(f"Updated consultation {consultation_id} status to '{status}'")
-        except IntegrityError as e:
-            logger.error(f"Integrity constraint violation during consultation update: {e}")
-            await _safe_rollback(db, "consultation")
-            raise DatabaseError("Data integrity error during status update", operation="commit", table="consultation", original_error=e)
+    params = {"cid": int(consultation_id), "status": status}
+    q = _UPDATE_CONSULTATION_STATUS
+    if total_duration is not None:
+        params["total_duration"] = total_duration
+        q = _UPDATE_CONSULTATION_STATUS_DURATION
     
-    except IntegrityError as e:
-        logger.error(f"Integrity error in update_consultation_status: {e}")
-        await _safe_rollback(db, "consultation")
-        raise DatabaseError("Data integrity error", operation="update", table="consultation", original_error=e)
-    
-    except (DisconnectionError, OperationalError) as e:
-        logger.error(f"Database operational error in update_consultation_status: {e}")
-        await _safe_rollback(db, "consultation")
-        raise DatabaseError("Database connection or operational error", operation="update", table="consultation", original_error=e)
-    
-    except SQLAlchemyDatabaseError as e:
-        logger.error(f"SQLAlchemy database error in update_consultation_status: {e}")
-        await _safe_rollback(db, "consultation")
-        raise DatabaseError("Database error during status update", operation="update", table="consultation", original_error=e)
-    
-    except Exception as e:
-        logger.error(f"Unexpected error in update_consultation_status: {e}", exc_info=True)
-        await _safe_rollback(db, "consultation")
-        raise DatabaseError("Unexpected error during status update", operation="update", table="consultation", original_error=e)
+    await db.execute(q, params)
+    await db.commit()
+    logger.info(f"Updated consultation {consultation_id} status to '{status}'")
 
 
+@_db_guard("consultation_sessions", "update", "token update")
 async def update_session_tokens(
     db: AsyncSession,
     *,
@@ -536,44 +573,74 @@ async def update_session_tokens(
     tokens_used: int,
 ) -> None:
     """Update session with total tokens used using existing field"""
-    try:
-        q = (
-            update(ConsultationSessions)
-            .where(ConsultationSessions.session_id == int(session_id))
-            .values(total_tokens_used=ConsultationSessions.total_tokens_used + tokens_used)
-        )
-        
-        try:
-            await db.execute(q)
-        except (DisconnectionError, OperationalError) as e:
-            logger.error(f"Database connection error during token update: {e}")
-            await _safe_rollback(db, "consultation_sessions")
-            raise DatabaseError("Database connection failed during token update", operation="update", table="consultation_sessions", original_error=e)
-        
-        try:
-            await db.commit()
-            logger.debug(f"Updated session {session_id} with {tokens_used} tokens")
-        except IntegrityError as e:
-            logger.error(f"Integrity constraint violation during token update: {e}")
-            await _safe_rollback(db, "consultation_sessions")
-            raise DatabaseError("Data integrity error during token update", operation="commit", table="consultation_sessions", original_error=e)
-    
-    except (DisconnectionError, OperationalError) as e:
-        logger.error(f"Database operational error in update_session_tokens: {e}")
-        await _safe_rollback(db, "consultation_sessions")
-        raise DatabaseError("Database connection or operational error", operation="update", table="consultation_sessions", original_error=e)
-    
-    except SQLAlchemyDatabaseError as e:
-        logger.error(f"SQLAlchemy database error in update_session_tokens: {e}")
-        await _safe_rollback(db, "consultation_sessions")
-        raise DatabaseError("Database error during token update", operation="update", table="consultation_sessions", original_error=e)
+    await db.execute(_INCREMENT_SESSION_STATS, {"sid": int(session_id), "tokens": int(tokens_used or 0), "calls": 0})
+    await db.commit()
+    logger.debug("Updated session %s with %s tokens", session_id, tokens_used)
+
+
+async def _commit_batch(table: str, rows: list, write) -> None:
+    """Run write(db) for a drained batch in one transaction on its own session.
     
-    except Exception as e:
-        logger.error(f"Unexpected error in update_session_tokens: {e}", exc_info=True)
-        await _safe_rollback(db, "consultation_sessions")
-        raise DatabaseError("Unexpected error during token update", operation="update", table="consultation_sessions", original_error=e)
+    Transient errors are retried with backoff; anything else is logged and the
+    batch dropped, since the callers that queued it have already returned.
+    """
+    async with AsyncSessionLocal() as db:
+        for attempt in range(_TRANSIENT_ATTEMPTS):
+            try:
+                await write(db)
+                await db.commit()
+                logger.debug("Flushed %s %s rows", len(rows), table)
+                return
+            except (DisconnectionError, OperationalError) as e:
+                await _safe_rollback(db, table)
+                if attempt < _TRANSIENT_ATTEMPTS - 1:
+                    await asyncio.sleep(_transient_backoff(attempt))
+                    continue
+                logger.error("Failed to write %s %s rows: %s", len(rows), table, e, exc_info=True)
+            except Exception as e:
+                await _safe_rollback(db, table)
+                logger.error("Failed to write %s %s rows: %s", len(rows), table, e, exc_info=True)
+                return
 
 
+async def _drain_in_batches(queue: asyncio.Queue, batch_max: int, flush_seconds: float, write_batch) -> None:
+    """Collect queued rows until batch_max or flush_seconds after the first, then write them"""
+    loop = asyncio.get_running_loop()
+    while True:
+        rows = [await queue.get()]
+        deadline = loop.time() + flush_seconds
+        while len(rows) < batch_max:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                rows.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        try:
+            await write_batch(rows)
+        finally:
+            for _ in rows:
+                queue.task_done()
+
+
+def _message_row(
+    session_id: int,
+    sender_type: str,
+    message_text: Optional[str],
+    audio_url: Optional[str],
+    processing_time_ms: Optional[int],
+) -> dict:
+    return {
+        "session_id": int(session_id),
+        "sender_type": sender_type,
+        "message_text": message_text or "",
+        "audio_url": audio_url,
+        "processing_time_ms": int(processing_time_ms or 1000),
+    }
+
+
+@_db_guard("consultation_messages", "insert", "message append")
 async def append_message(
     db: AsyncSession,
     *,
@@ -583,48 +650,15 @@ async def append_message(
     audio_url: Optional[str] = None,
     processing_time_ms: Optional[int] = None,
 ) -> None:
-    try:
-        db.add(ConsultationMessages(
-            session_id=int(session_id),
-            sender_type=sender_type,
-            message_text=message_text or "",
-            audio_url=audio_url,
-            processing_time_ms=int(processing_time_ms or 1000),
-        ))
-        
-        try:
-            await db.commit()
-            logger.debug(f"Appended {sender_type} message to session {session_id}")
-        except IntegrityError as e:
-            logger.error(f"Integrity constraint violation during message append: {e}")
-            await _safe_rollback(db, "consultation_messages")
-            raise DatabaseError("Foreign key violation - session may not exist", operation="commit", table="consultation_messages", original_error=e)
-        except (DisconnectionError, OperationalError) as e:
-            logger.error(f"Database connection error during message append: {e}")
-            await _safe_rollback(db, "consultation_messages")
-            raise DatabaseError("Database connection failed during message append", operation="commit", table="consultation_messages", original_error=e)
-    
-    except IntegrityError as e:
-        logger.error(f"Integrity error in append_message: {e}")
-        await _safe_rollback(db, "consultation_messages")
-        raise DatabaseError("Foreign key or constraint violation", operation="insert", table="consultation_messages", original_error=e)
-    
-    except (DisconnectionError, OperationalError) as e:
-        logger.error(f"Database operational error in append_message: {e}")
-        await _safe_rollback(db, "consultation_messages")
-        raise DatabaseError("Database connection or operational error", operation="insert", table="consultation_messages", original_error=e)
-    
-    except SQLAlchemyDatabaseError as e:
-        logger.error(f"SQLAlchemy database error in append_message: {e}")
-        await _safe_rollback(db, "consultation_messages")
-        raise DatabaseError("Database error during message append", operation="insert", table="consultation_messages", original_error=e)
-    
-    except Exception as e:
-        logger.error(f"Unexpected error in append_message: {e}", exc_info=True)
-        await _safe_rollback(db, "consultation_messages")
-        raise DatabaseError("Unexpected error during message append", operation="insert", table="consultation_messages", original_error=e)
+    await db.execute(
+        _INSERT_MESSAGES,
+        _message_row(session_id, sender_type, message_text, audio_url, processing_time_ms),
+    )
+    await db.commit()
+    logger.debug("Appended %s message to session %s", sender_type, session_id)
 
 
+@_db_guard("consultation_messages", "insert", "audio message append")
 async def append_audio_message(
     db: AsyncSession,
     *,
@@ -635,98 +669,160 @@ async def append_audio_message(
     processing_time_ms: int,
 ) -> None:
     """Enhanced message logging with audio URL and processing time"""
+    await db.execute(
+        _INSERT_MESSAGES,
+        _message_row(session_id, sender_type, message_text, audio_url, processing_time_ms),
+    )
+    await db.commit()
+    logger.debug("Appended %s audio message to session %s", sender_type, session_id)
+
+
+# Deferred API usage telemetry: usage rows are queued and a single writer task
+# inserts each batch under one commit. The queue is bounded; when it is full the
+# caller writes its rows inline instead, so a stalled writer slows callers down
+# rather than growing memory or dropping rows. Session token / call counters are
+# not deferred: callers bump them atomically on their own transaction
+_TELEMETRY_BATCH_MAX = 500
+_TELEMETRY_FLUSH_SECONDS = 0.2
+_TELEMETRY_QUEUE_MAX = 10000
+# Longest flush_telemetry waits for the writer before giving up on the remaining rows
+_TELEMETRY_FLUSH_TIMEOUT = 10.0
+_telemetry_queue: Optional[asyncio.Queue] = None
+_telemetry_writer: Optional[asyncio.Task] = None
+
+
+async def _write_telemetry_batch(rows: list) -> None:
+    """Insert a batch of usage rows in one transaction"""
+    async def write(db: AsyncSession) -> None:
+        await db.execute(_INSERT_API_USAGE, rows)
+    await _commit_batch("api_usage_logs", rows, write)
+
+
+def start_telemetry_writer() -> None:
+    """Start the background API usage writer on the running event loop if it is not running"""
+    global _telemetry_queue, _telemetry_writer
+    if _telemetry_queue is None:
+        _telemetry_queue = asyncio.Queue(maxsize=_TELEMETRY_QUEUE_MAX)
+    if _telemetry_writer is None or _telemetry_writer.done():
+        _telemetry_writer = asyncio.create_task(
+            _drain_in_batches(_telemetry_queue, _TELEMETRY_BATCH_MAX, _TELEMETRY_FLUSH_SECONDS, _write_telemetry_batch)
+        )
+
+
+async def flush_telemetry() -> None:
+    """Wait until every queued API usage row has been written to the database.
+    
+    If the writer task is no longer running the queued rows are written inline;
+    otherwise the wait is bounded by _TELEMETRY_FLUSH_TIMEOUT so shutdown cannot hang.
+    """
+    if _telemetry_queue is None:
+        return
+    if _telemetry_writer is None or _telemetry_writer.done():
+        rows = []
+        while not _telemetry_queue.empty():
+            rows.append(_telemetry_queue.get_nowait())
+        if rows:
+            logger.warning("API usage writer is not running, writing %s queued rows inline", len(rows))
+        for start in range(0, len(rows), _TELEMETRY_BATCH_MAX):
+            await _write_telemetry_batch(rows[start:start + _TELEMETRY_BATCH_MAX])
+        for _ in rows:
+            _telemetry_queue.task_done()
+        return
     try:
-        db.add(ConsultationMessages(
-            session_id=int(session_id),
-            sender_type=sender_type,
-            message_text=message_text or "",
-            audio_url=audio_url,
-            processing_time_ms=int(processing_time_ms or 1000),
-        ))
-        
+        await asyncio.wait_for(_telemetry_queue.join(), _TELEMETRY_FLUSH_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.error(
+            "Timed out after %.0fs flushing API usage rows, %s still queued",
+            _TELEMETRY_FLUSH_TIMEOUT, _telemetry_queue.qsize()
+        )
+
+
+def _api_usage_row(
+    usage: dict,
+    *,
+    response_time_ms: int,
+    status: str = "success",
+    session_id: Optional[int] = None,
+    doctor_id: Optional[int] = None,
+    patient_id: Optional[int] = None,
+    hospital_id: Optional[int] = None,
+) -> dict:
+    """Build one api_usage_logs row from a service usage dict (service_type, tokens_used, cost)"""
+    return {
+        "service_type": usage["service_type"] or "unknown",
+        "response_time_ms": int(response_time_ms or 0),
+        "status": status or "success",
+        "session_id": session_id,
+        "doctor_id": doctor_id,
+        "patient_id": patient_id,
+        "hospital_id": hospital_id,
+        "tokens_used": usage["tokens_used"] or 0,
+        "cost": float(usage["cost"] or 0.0),
+        "api_calls": 1,
+    }
+
+
+def _session_increments(rows: list) -> list:
+    """Per-session _INCREMENT_SESSION_STATS parameters for a list of usage rows"""
+    tokens: defaultdict = defaultdict(int)
+    calls: defaultdict = defaultdict(int)
+    for row in rows:
+        if row["session_id"]:
+            tokens[row["session_id"]] += row["tokens_used"]
+            calls[row["session_id"]] += row["api_calls"]
+    return [{"sid": int(sid), "tokens": tokens[sid], "calls": calls[sid]} for sid in tokens]
+
+
+async def _queue_api_usage(rows: list) -> None:
+    """Hand usage rows to the background writer, writing them inline if its queue is full"""
+    start_telemetry_writer()
+    overflow = []
+    for row in rows:
         try:
-            await db.commit()
-            logger.debug(f"Appended {sender_type} audio message to session {session_id}")
-        except IntegrityError as e:
-            logger.error(f"Integrity constraint violation during audio message append: {e}")
-            await _safe_rollback(db, "consultation_messages")
-            raise DatabaseError("Foreign key violation - session may not exist", operation="commit", table="consultation_messages", original_error=e)
-        except (DisconnectionError, OperationalError) as e:
-            logger.error(f"Database connection error during audio message append: {e}")
-            await _safe_rollback(db, "consultation_messages")
-            raise DatabaseError("Database connection failed during audio message append", operation="commit", table="consultation_messages", original_error=e)
-    
-    except IntegrityError as e:
-        logger.error(f"Integrity error in append_audio_message: {e}")
-        await _safe_rollback(db, "consultation_messages")
-        raise DatabaseError("Foreign key or constraint violation", operation="insert", table="consultation_messages", original_error=e)
-    
-    except (DisconnectionError, OperationalError) as e:
-        logger.error(f"Database operational error in append_audio_message: {e}")
-        await _safe_rollback(db, "consultation_messages")
-        raise DatabaseError("Database connection or operational error", operation="insert", table="consultation_messages", original_error=e)
-    
-    except SQLAlchemyDatabaseError as e:
-        logger.error(f"SQLAlchemy database error in append_audio_message: {e}")
-        await _safe_rollback(db, "consultation_messages")
-        raise DatabaseError("Database error during audio message append", operation="insert", table="consultation_messages", original_error=e)
-    
-    except Exception as e:
-        logger.error(f"Unexpected error in append_audio_message: {e}", exc_info=True)
-        await _safe_rollback(db, "consultation_messages")
-        raise DatabaseError("Unexpected error during audio message append", operation="insert", table="consultation_messages", original_error=e)
+            _telemetry_queue.put_nowait(row)
+        except asyncio.QueueFull:
+            overflow.append(row)
+    if overflow:
+        logger.warning(
+            "API usage queue full (%s rows pending), writing %s rows inline",
+            _telemetry_queue.qsize(), len(overflow)
+        )
+        await _write_telemetry_batch(overflow)
 
 
+@_db_guard("consultation_messages", "select", "transcript retrieval", retry=True)
 async def get_session_transcript_text(
     db: AsyncSession,
     *,
     session_id: int,
 ) -> str:
     """Get formatted transcript text from session messages"""
-    try:
-        from sqlalchemy import select
-        
-        # Get all messages for this session
-        try:
-            result = await db.execute(
-                select(ConsultationMessages)
-                .where(ConsultationMessages.session_id == int(session_id))
-                .order_by(ConsultationMessages.timestamp)
-            )
-            messages = result.scalars().all()
-        except (DisconnectionError, OperationalError) as e:
-            logger.error(f"Database connection error while fetching transcript: {e}")
-            raise DatabaseError("Database connection failed while fetching transcript", operation="select", table="consultation_messages", original_error=e)
-        
-        # Format transcript
-        try:
-            transcript_lines = []
-            for msg in messages:
-                sender = "Patient" if msg.sender_type == "patient" else "Doctor"
-                text = msg.message_text or ""
-                timestamp = msg.timestamp.strftime("%Y-%m-%d %H:%M:%S") if msg.timestamp else ""
-                transcript_lines.append(f"[{timestamp}] {sender}: {text}")
-            
-            transcript = "\n".join(transcript_lines)
-            logger.debug(f"Retrieved transcript for session {session_id} with {len(messages)} messages")
-            return transcript
-        except Exception as e:
-            logger.error(f"Error formatting transcript: {e}")
-            raise DatabaseError("Failed to format transcript", operation="format", table="consultation_messages", original_error=e)
-    
-    except (DisconnectionError, OperationalError) as e:
-        logger.error(f"Database operational error in get_session_transcript_text: {e}")
-        raise DatabaseError("Database connection or operational error", operation="select", table="consultation_messages", original_error=e)
+    # Stream messages for this session in chunks and write lines straight into one
+    # buffer, so long sessions never hold both the row list and the line list
+    result = await db.stream(
+        select(
+            ConsultationMessages.sender_type,
+            ConsultationMessages.message_text,
+            ConsultationMessages.timestamp,
+        )
+        .where(ConsultationMessages.session_id == int(session_id))
+        .order_by(ConsultationMessages.timestamp)
+        .execution_options(yield_per=_TRANSCRIPT_YIELD_PER)
+    )
     
-    except SQLAlchemyDatabaseError as e:
-        logger.error(f"SQLAlchemy database error in get_session_transcript_text: {e}")
-        raise DatabaseError("Database error while getting transcript", operation="select", table="consultation_messages", original_error=e)
+    buf = io.StringIO()
+    count = 0
+    async for sender_type, text, ts in result:
+        if count:
+            buf.write("\n")
+        buf.write(f"[{ts.isoformat(' ', 'seconds') if ts else ''}] {_TRANSCRIPT_SENDER_LABELS.get(sender_type, 'Doctor')}: {text or ''}")
+        count += 1
     
-    except Exception as e:
-        logger.error(f"Unexpected error in get_session_transcript_text: {e}", exc_info=True)
-        raise DatabaseError("Unexpected error while getting transcript", operation="select", table="consultation_messages", original_error=e)
+    logger.debug("Retrieved transcript for session %s with %s messages", session_id, count)
+    return buf.getvalue()
 
 
+@_db_guard("consultation_transcripts", "insert", "transcript save")
 async def save_transcript(
     db: AsyncSession,
     *,
@@ -738,222 +834,83 @@ async def save_transcript(
     
     Note: Only consultation_id, transcript_text, and file_url are stored.
     The model does NOT include hospital_id, doctor_id, patient_id, or service_type.
+    Empty or whitespace-only transcripts are not stored and return 0.
     """
-    try:
-        row = ConsultationTranscripts(
+    if not transcript_text or not transcript_text.strip():
+        logger.info(f"Skipping empty transcript for consultation {consultation_id}")
+        return 0
+    
+    # Core INSERT: MySQL has no RETURNING, but the new transcript_id comes back
+    # as the cursor lastrowid, so no flush + refresh SELECT is needed
+    result = await db.execute(
+        insert(ConsultationTranscripts).values(
             consultation_id=int(consultation_id),
             transcript_text=transcript_text,
             file_url=file_url,
         )
-        db.add(row)
-        
-        # Flush with explicit exception handling
-        try:
-            await db.flush()
-        except IntegrityError as e:
-            await _safe_rollback(db, "consultation_transcripts")
-            logger.error(f"Integrity error during transcript flush: {e}")
-            raise DataIntegrityError(
-                "Foreign key violation - consultation may not exist",
-                constraint_type="foreign_key",
-                table="consultation_transcripts",
-                field="consultation_id",
-                value=consultation_id,
-                original_error=e,
-                context={
-                    "operation": "save_transcript_flush",
-                    "transcript_length": len(transcript_text),
-                    "has_file_url": bool(file_url)
-                }
-            )
-        except (DisconnectionError, OperationalError) as e:
-            await _safe_rollback(db, "consultation_transcripts")
-            logger.error(f"Database connection error during transcript flush: {e}")
-            raise ConnectionError(
-                "Database connection failed during transcript save",
-                operation="save_transcript_flush",
-                original_error=e,
-                context={
-                    "table": "consultation_transcripts",
-                    "consultation_id": consultation_id,
-                    "transcript_length": len(transcript_text)
-                }
-            )
-        except InvalidRequestError as e:
-            await _safe_rollback(db, "consultation_transcripts")
-            logger.error(f"Invalid session state during transcript flush: {e}")
-            raise TransactionError(
-                "Session state error during transcript save",
-                operation="save_transcript_flush",
-                table="consultation_transcripts",
-                transaction_state="flush_failed",
-                original_error=e,
-                context={
-                    "consultation_id": consultation_id,
-                    "transcript_length": len(transcript_text)
-                }
-            )
-        
-        # Refresh with explicit exception handling
-        try:
-            await db.refresh(row)
-        except InvalidRequestError as e:
-            await _safe_rollback(db, "consultation_transcripts")
-            logger.error(f"Invalid session state during transcript refresh: {e}")
-            raise TransactionError(
-                "Session state error during transcript refresh",
-                operation="save_transcript_refresh",
-                table="consultation_transcripts",
-                transaction_state="refresh_failed",
-                original_error=e,
-                context={
-                    "consultation_id": consultation_id,
-                    "transcript_length": len(transcript_text)
-                }
-            )
-        except (DisconnectionError, OperationalError) as e:
-            await _safe_rollback(db, "consultation_transcripts")
-            logger.error(f"Database connection error during transcript refresh: {e}")
-            raise ConnectionError(
-                "Database connection failed during transcript refresh",
-                operation="save_transcript_refresh",
-                original_error=e,
-                context={
-                    "table": "consultation_transcripts",
-                    "consultation_id": consultation_id,
-                    "transcript_length": len(transcript_text)
-                }
-            )
-        
-        try:
-            await db.commit()
-        except IntegrityError as e:
-            logger.error(f"Integrity constraint violation during transcript save: {e}")
-            await _safe_rollback(db, "consultation_transcripts")
-            raise DatabaseError("Foreign key violation - consultation may not exist", operation="commit", table="consultation_transcripts", original_error=e)
-        
-        logger.info(f"Saved transcript {row.transcript_id} for consultation {consultation_id}")
-        return int(row.transcript_id)
-    
-    except IntegrityError as e:
-        logger.error(f"Integrity error in save_transcript: {e}")
-        await _safe_rollback(db, "consultation_transcripts")
-        raise DatabaseError("Foreign key or constraint violation", operation="insert", table="consultation_transcripts", original_error=e)
-    
-    except (DisconnectionError, OperationalError) as e:
-        logger.error(f"Database operational error in save_transcript: {e}")
-        await _safe_rollback(db, "consultation_transcripts")
-        raise DatabaseError("Database connection or operational error", operation="insert", table="consultation_transcripts", original_error=e)
-    
-    except SQLAlchemyDatabaseError as e:
-        logger.error(f"SQLAlchemy database error in save_transcript: {e}")
-        await _safe_rollback(db, "consultation_transcripts")
-        raise DatabaseError("Database error during transcript save", operation="insert", table="consultation_transcripts", original_error=e)
+    )
+    transcript_id = int(result.lastrowid)
+    await db.commit()
     
-    except Exception as e:
-        logger.error(f"Unexpected error in save_transcript: {e}", exc_info=True)
-        await _safe_rollback(db, "consultation_transcripts")
-        raise DatabaseError("Unexpected error during transcript save", operation="insert", table="consultation_transcripts", original_error=e)
+    logger.info(f"Saved transcript {transcript_id} for consultation {consultation_id}")
+    return transcript_id
 
 
-async def record_turn(
-    db: AsyncSession,
-    *,
-    session_id: int,
-    patient_text: Optional[str],
-    assistant_text: Optional[str],
-    service_type: str,
-    response_time_ms: int,
-    status: str = "success",
-    doctor_id: Optional[int] = None,
-    patient_id: Optional[int] = None,
-    hospital_id: Optional[int] = None,
-    tokens_used: Optional[int] = None,
-    cost: Optional[float] = None,
-    audio_url: Optional[str] = None,
-    processing_time_ms: Optional[int] = None,
-) -> None:
+@dataclass(frozen=True)
+class TurnRecord:
+    """One conversation turn: the exchanged messages and the API call that produced the reply"""
+    session_id: int
+    patient_text: Optional[str]
+    assistant_text: Optional[str]
+    service_type: str
+    response_time_ms: int
+    status: str = "success"
+    doctor_id: Optional[int] = None
+    patient_id: Optional[int] = None
+    hospital_id: Optional[int] = None
+    tokens_used: Optional[int] = None
+    cost: Optional[float] = None
+    audio_url: Optional[str] = None
+    processing_time_ms: Optional[int] = None
+
+
+@_db_guard("consultation_messages/api_usage_logs", "insert", "turn recording")
+async def record_turn(db: AsyncSession, turn: TurnRecord) -> None:
     """Enhanced turn recording with comprehensive API logging and audio data."""
-    try:
-        # Use response_time_ms if processing_time_ms is not provided or is 0
-        proc_time = processing_time_ms if processing_time_ms and processing_time_ms > 0 else response_time_ms
-        
-        if patient_text:
-            db.add(ConsultationMessages(
-                session_id=int(session_id),
-                sender_type="patient",
-                message_text=patient_text or "",
-                audio_url=audio_url,
-                processing_time_ms=int(proc_time or 1000),
-            ))
-        if assistant_text:
-            db.add(ConsultationMessages(
-                session_id=int(session_id),
-                sender_type="assistant",
-                message_text=assistant_text or "",
-                audio_url=audio_url,
-                processing_time_ms=int(proc_time or 1000),
-            ))
-        db.add(ApiUsageLogs(
-            service_type=service_type or "unknown",
-            response_time_ms=int(response_time_ms or 0),
-            status=status or "success",
-            session_id=int(session_id),
-            doctor_id=doctor_id,
-            patient_id=patient_id,
-            hospital_id=hospital_id,
-            tokens_used=tokens_used or 0,
-            cost=float(cost or 0.0),
-            api_calls=1,
-        ))
-        
-        # Update session stats - Don't await here to avoid nested commits
-        try:
-            q = (
-                update(ConsultationSessions)
-                .where(ConsultationSessions.session_id == int(session_id))
-                .values(
-                    total_tokens_used=ConsultationSessions.total_tokens_used + (tokens_used or 0),
-                    total_api_calls=ConsultationSessions.total_api_calls + 1
-                )
-            )
-            await db.execute(q)
-        except (DisconnectionError, OperationalError) as e:
-            logger.error(f"Database connection error during session stats update in record_turn: {e}")
-            await _safe_rollback(db, "consultation_sessions")
-            raise DatabaseError("Database connection failed during turn recording", operation="update", table="consultation_sessions", original_error=e)
-        
-        try:
-            await db.commit()
-            logger.debug(f"Recorded turn for session {session_id} with service {service_type}")
-        except IntegrityError as e:
-            logger.error(f"Integrity constraint violation during turn recording: {e}")
-            await _safe_rollback(db, "consultation_messages/api_usage_logs")
-            raise DatabaseError("Foreign key violation during turn recording", operation="commit", table="consultation_messages/api_usage_logs", original_error=e)
-        except (DisconnectionError, OperationalError) as e:
-            logger.error(f"Database connection error during turn commit: {e}")
-            await _safe_rollback(db, "consultation_messages/api_usage_logs")
-            raise DatabaseError("Database connection failed during turn commit", operation="commit", table="consultation_messages/api_usage_logs", original_error=e)
+    # Use response_time_ms if processing_time_ms is not provided or is 0
+    proc_time = int(turn.processing_time_ms) if turn.processing_time_ms and turn.processing_time_ms > 0 else int(turn.response_time_ms or 1000)
+    sid = int(turn.session_id)
     
-    except IntegrityError as e:
-        logger.error(f"Integrity error in record_turn: {e}")
-        await _safe_rollback(db, "consultation_messages/api_usage_logs")
-        raise DatabaseError("Foreign key or constraint violation", operation="insert", table="consultation_messages/api_usage_logs", original_error=e)
-    
-    except (DisconnectionError, OperationalError) as e:
-        logger.error(f"Database operational error in record_turn: {e}")
-        await _safe_rollback(db, "consultation_messages/api_usage_logs")
-        raise DatabaseError("Database connection or operational error", operation="insert", table="consultation_messages/api_usage_logs", original_error=e)
-    
-    except SQLAlchemyDatabaseError as e:
-        logger.error(f"SQLAlchemy database error in record_turn: {e}")
-        await _safe_rollback(db, "consultation_messages/api_usage_logs")
-        raise DatabaseError("Database error during turn recording", operation="insert", table="consultation_messages/api_usage_logs", original_error=e)
+    # Both sides of the turn go out as one multi-row INSERT
+    messages = [
+        {
+            "session_id": sid,
+            "sender_type": sender_type,
+            "message_text": message_text,
+            "audio_url": turn.audio_url,
+            "processing_time_ms": proc_time,
+        }
+        for sender_type, message_text in (("patient", turn.patient_text), ("assistant", turn.assistant_text))
+        if message_text
+    ]
+    usage_row = _api_usage_row(
+        {"service_type": turn.service_type, "tokens_used": turn.tokens_used, "cost": turn.cost},
+        response_time_ms=turn.response_time_ms,
+        status=turn.status,
+        session_id=sid,
+        doctor_id=turn.doctor_id,
+        patient_id=turn.patient_id,
+        hospital_id=turn.hospital_id,
+    )
     
-    except Exception as e:
-        logger.error(f"Unexpected error in record_turn: {e}", exc_info=True)
-        await _safe_rollback(db, "consultation_messages/api_usage_logs")
-        raise DatabaseError("Unexpected error during turn recording", operation="insert", table="consultation_messages/api_usage_logs", original_error=e)
+    # Messages and the session counters commit together; the usage row is telemetry
+    # and goes to the background writer
+    if messages:
+        await db.execute(_INSERT_MESSAGES, messages)
+    await db.execute(_INCREMENT_SESSION_STATS, {"sid": sid, "tokens": usage_row["tokens_used"], "calls": 1})
+    await db.commit()
+    await _queue_api_usage([usage_row])
+    logger.debug("Recorded turn for session %s with service %s", turn.session_id, turn.service_type)
 
 
 async def get_consultation_details(
@@ -966,10 +923,10 @@ async def get_consultation_details(
     Returns consultation object or None if not found
     """
     try:
-        from sqlalchemy import select
-        
         result = await db.execute(
-            select(Consultation).where(Consultation.consultation_id == consultation_id)
+            select(Consultation)
+            .where(Consultation.consultation_id == consultation_id)
+            .options(load_only(*_CONSULTATION_DETAIL_COLUMNS), raiseload("*"))
         )
         consultation = result.scalar_one_or_none()
         
@@ -992,6 +949,7 @@ async def create_audit(
     old_values: Optional[dict] = None,
     new_values: Optional[dict] = None,
     user_agent: Optional[str] = None,
+    commit: bool = True,
 ) -> None:
     await _create_audit_log(
         db,
@@ -1002,10 +960,12 @@ async def create_audit(
         old_values=old_values,
         new_values=new_values,
         user_agent=user_agent,
+        commit=commit,
     )
 
 
 
+@_db_guard("consultation_sessions", "update", "stats update")
 async def update_session_stats(
     db: AsyncSession,
     *,
@@ -1014,108 +974,64 @@ async def update_session_stats(
     api_calls: int = 1,
 ) -> None:
     """Update session with tokens and API call counts"""
-    try:
-        q = (
-            update(ConsultationSessions)
-            .where(ConsultationSessions.session_id == int(session_id))
-            .values(
-                total_tokens_used=ConsultationSessions.total_tokens_used + tokens_used,
-                total_api_calls=ConsultationSessions.total_api_calls + api_calls
-            )
-        )
-        
-        try:
-            await db.execute(q)
-        except (DisconnectionError, OperationalError) as e:
-            logger.error(f"Database connection error during session stats update: {e}")
-            await _safe_rollback(db, "consultation_sessions")
-            raise DatabaseError("Database connection failed during stats update", operation="update", table="consultation_sessions", original_error=e)
-        
-        try:
-            await db.commit()
-            logger.debug(f"Updated session {session_id} stats: tokens={tokens_used}, api_calls={api_calls}")
-        except IntegrityError as e:
-            logger.error(f"Integrity constraint violation during stats update: {e}")
-            await _safe_rollback(db, "consultation_sessions")
-            raise DatabaseError("Data integrity error during stats update", operation="commit", table="consultation_sessions", original_error=e)
-    
-    except (DisconnectionError, OperationalError) as e:
-        logger.error(f"Database operational error in update_session_stats: {e}")
-        await _safe_rollback(db, "consultation_sessions")
-        raise DatabaseError("Database connection or operational error", operation="update", table="consultation_sessions", original_error=e)
-    
-    except SQLAlchemyDatabaseError as e:
-        logger.error(f"SQLAlchemy database error in update_session_stats: {e}")
-        await _safe_rollback(db, "consultation_sessions")
-        raise DatabaseError("Database error during stats update", operation="update", table="consultation_sessions", original_error=e)
-    
-    except Exception as e:
-        logger.error(f"Unexpected error in update_session_stats: {e}", exc_info=True)
-        await _safe_rollback(db, "consultation_sessions")
-        raise DatabaseError("Unexpected error during stats update", operation="update", table="consultation_sessions", original_error=e)
+    await db.execute(
+        _INCREMENT_SESSION_STATS,
+        {"sid": int(session_id), "tokens": int(tokens_used or 0), "calls": int(api_calls or 0)},
+    )
+    await db.commit()
+    logger.debug("Updated session %s stats: tokens=%s, api_calls=%s", session_id, tokens_used, api_calls)
 
 
+@_db_guard("consultation", "update", "duration update", retry=True)
 async def update_consultation_duration(
     db: AsyncSession,
     *,
     consultation_id: int,
 ) -> None:
     """Calculate and update consultation total duration from session times"""
-    try:
-        from sqlalchemy import select, func
-        
-        # Calculate total duration from all sessions
-        try:
-            result = await db.execute(
-                select(func.sum(
-                    func.extract('epoch', ConsultationSessions.session_end) - 
-                    func.extract('epoch', ConsultationSessions.session_start)
-                ).label('total_seconds'))
-                .where(
-                    ConsultationSessions.consultation_id == int(consultation_id),
-                    ConsultationSessions.session_end.isnot(None)
-                )
-            )
-            total_seconds = result.scalar() or 0
-        except (DisconnectionError, OperationalError) as e:
-            logger.error(f"Database connection error during duration calculation: {e}")
-            await _safe_rollback(db, "consultation")
-            raise DatabaseError("Database connection failed during duration calculation", operation="select", table="consultation_sessions", original_error=e)
-        
-        try:
-            q = (
-                update(Consultation)
-                .where(Consultation.consultation_id == int(consultation_id))
-                .values(total_duration=int(total_seconds))
-            )
-            await db.execute(q)
-        except (DisconnectionError, OperationalError) as e:
-            logger.error(f"Database connection error during duration update: {e}")
-            await _safe_rollback(db, "consultation")
-            raise DatabaseError("Database connection failed during duration update", operation="update", table="consultation", original_error=e)
-        
-        try:
-            await db.commit()
-            logger.info(f"Updated consultation {consultation_id} duration to {int(total_seconds)} seconds")
-        except IntegrityError as e:
-            logger.error(f"Integrity constraint violation during duration update: {e}")
-            await _safe_rollback(db, "consultation")
-            raise DatabaseError("Data integrity error during duration update", operation="commit", table="consultation", original_error=e)
-    
-    except (DisconnectionError, OperationalError) as e:
-        logger.error(f"Database operational error in update_consultation_duration: {e}")
-        await _safe_rollback(db, "consultation")
-        raise DatabaseError("Database connection or operational error", operation="update", table="consultation", original_error=e)
-    
-    except SQLAlchemyDatabaseError as e:
-        logger.error(f"SQLAlchemy database error in update_consultation_duration: {e}")
-        await _safe_rollback(db, "consultation")
-        raise DatabaseError("Database error during duration update", operation="update", table="consultation", original_error=e)
+    await db.execute(_UPDATE_CONSULTATION_DURATION, {"cid": int(consultation_id)})
+    await db.commit()
+    logger.info(f"Updated consultation {consultation_id} duration from session times")
+
+
+async def _get_consultation_ids(db: AsyncSession, consultation_id: int) -> Optional[tuple]:
+    """Return (doctor_id, patient_id, hospital_id) for a consultation, or None if it does not exist"""
+    cid = int(consultation_id)
+    cached = _consultation_ids_cache.get(cid)
+    if cached is not None and cached[0] > time.time():
+        return cached[1]
     
-    except Exception as e:
-        logger.error(f"Unexpected error in update_consultation_duration: {e}", exc_info=True)
-        await _safe_rollback(db, "consultation")
-        raise DatabaseError("Unexpected error during duration update", operation="update", table="consultation", original_error=e)
+    result = await db.execute(
+        select(Consultation.doctor_id, Consultation.patient_id, Consultation.hospital_id)
+        .where(Consultation.consultation_id == cid)
+    )
+    row = result.one_or_none()
+    if row is None:
+        _consultation_ids_cache.pop(cid, None)
+        return None
+    ids = tuple(row)
+    _cache_consultation_ids(cid, ids)
+    return ids
+
+
+def _cache_consultation_ids(cid: int, ids: tuple) -> None:
+    now = time.time()
+    _consultation_ids_cache.pop(cid, None)
+    while _consultation_ids_cache:
+        oldest = next(iter(_consultation_ids_cache))
+        if _consultation_ids_cache[oldest][0] > now and len(_consultation_ids_cache) < _CONSULTATION_IDS_MAX:
+            break
+        del _consultation_ids_cache[oldest]
+    _consultation_ids_cache[cid] = (now + _CONSULTATION_IDS_TTL, ids)
+
+
+async def _apply_session_usage(db: AsyncSession, rows: list) -> None:
+    """Commit the session counters for usage rows on the caller's session, then queue the rows"""
+    increments = _session_increments(rows)
+    if increments:
+        await db.execute(_INCREMENT_SESSION_STATS, increments)
+        await db.commit()
+    await _queue_api_usage(rows)
 
 
 async def log_conversation_apis(
@@ -1128,67 +1044,27 @@ async def log_conversation_apis(
     rag_data: tuple = None
 ) -> None:
     """Log all APIs used in text conversation"""
-    import logging
-    logger = logging.getLogger(__name__)
-    
     try:
-        from sqlalchemy import select
-        from models.models import Consultation
-        from service.analytics_service import log_openai_chat, log_sarvam_translation, log_rag_retrieval
-        
-        consultation_result = await db.execute(
-            select(Consultation).where(Consultation.consultation_id == consultation_id)
-        )
-        consultation = consultation_result.scalar_one_or_none()
-        
-        if not consultation:
+        consultation_ids = await _get_consultation_ids(db, consultation_id)
+        if consultation_ids is None:
             logger.warning(f"Consultation {consultation_id} not found for API logging")
             return
         
-        try:
-            await log_openai_chat(
-                db=db,
-                input_tokens=openai_tokens[0],
-                output_tokens=openai_tokens[1],
-                response_time_ms=openai_latency,
-                session_id=session_db_id,
-                doctor_id=consultation.doctor_id,
-                patient_id=consultation.patient_id,
-                hospital_id=consultation.hospital_id
-            )
-        except Exception as e:
-            logger.error(f"Failed to log OpenAI chat: {e}")
-        
+        doctor_id, patient_id, hospital_id = consultation_ids
+        ids = dict(session_id=session_db_id, doctor_id=doctor_id, patient_id=patient_id, hospital_id=hospital_id)
+        rows = [_api_usage_row(openai_chat_usage(openai_tokens[0], openai_tokens[1]), response_time_ms=openai_latency, **ids)]
         if translation_data:
-            try:
-                await log_sarvam_translation(
-                    db=db,
-                    input_length=translation_data[0],
-                    output_length=translation_data[1],
-                    response_time_ms=translation_data[2],
-                    session_id=session_db_id,
-                    doctor_id=consultation.doctor_id,
-                    patient_id=consultation.patient_id,
-                    hospital_id=consultation.hospital_id
-                )
-            except Exception as e:
-                logger.error(f"Failed to log translation: {e}")
-        
+            rows.append(_api_usage_row(
+                sarvam_translation_usage(translation_data[0], translation_data[1]),
+                response_time_ms=translation_data[2],
+                **ids
+            ))
         if rag_data:
-            try:
-                await log_rag_retrieval(
-                    db=db,
-                    context_length=rag_data[0],
-                    response_time_ms=rag_data[1],
-                    session_id=session_db_id,
-                    doctor_id=consultation.doctor_id,
-                    patient_id=consultation.patient_id,
-                    hospital_id=consultation.hospital_id
-                )
-            except Exception as e:
-                logger.error(f"Failed to log RAG retrieval: {e}")
+            rows.append(_api_usage_row(rag_retrieval_usage(rag_data[0]), response_time_ms=rag_data[1], **ids))
+        await _apply_session_usage(db, rows)
     except Exception as e:
         logger.error(f"Failed to log conversation APIs: {e}")
+        await _safe_rollback(db, "consultation_sessions")
         # Don't raise - allow the request to continue
 
 
@@ -1204,184 +1080,77 @@ async def log_speech_apis(
     rag_data: tuple = None
 ) -> None:
     """Log all APIs used in speech conversation"""
-    import logging
-    logger = logging.getLogger(__name__)
-    
     try:
-        from sqlalchemy import select
-        from models.models import Consultation
-        from service.analytics_service import (
-            log_deepgram_stt, log_sarvam_stt, log_openai_chat,
-            log_sarvam_translation, log_rag_retrieval
-        )
-        
-        consultation_result = await db.execute(
-            select(Consultation).where(Consultation.consultation_id == consultation_id)
-        )
-        consultation = consultation_result.scalar_one_or_none()
-        
-        if not consultation:
+        consultation_ids = await _get_consultation_ids(db, consultation_id)
+        if consultation_ids is None:
             logger.warning(f"Consultation {consultation_id} not found for speech API logging")
             return
         
-        # Log STT
-        try:
-            if stt_provider == "deepgram":
-                await log_deepgram_stt(
-                    db=db,
-                    audio_duration_sec=stt_data[0],
-                    response_time_ms=stt_data[1],
-                    transcript=stt_data[2],
-                    session_id=session_db_id,
-                    doctor_id=consultation.doctor_id,
-                    patient_id=consultation.patient_id,
-                    hospital_id=consultation.hospital_id
-                )
-            elif stt_provider == "sarvam":
-                await log_sarvam_stt(
-                    db=db,
-                    audio_duration_sec=stt_data[0],
-                    response_time_ms=stt_data[1],
-                    transcript=stt_data[2],
-                    session_id=session_db_id,
-                    doctor_id=consultation.doctor_id,
-                    patient_id=consultation.patient_id,
-                    hospital_id=consultation.hospital_id
-                )
-        except Exception as e:
-            logger.error(f"Failed to log STT ({stt_provider}): {e}")
-        
-        # Log OpenAI
-        try:
-            await log_openai_chat(
-                db=db,
-                input_tokens=openai_tokens[0],
-                output_tokens=openai_tokens[1],
-                response_time_ms=openai_latency,
-                session_id=session_db_id,
-                doctor_id=consultation.doctor_id,
-                patient_id=consultation.patient_id,
-                hospital_id=consultation.hospital_id
-            )
-        except Exception as e:
-            logger.error(f"Failed to log OpenAI chat: {e}")
-        
-        # Log translation
+        doctor_id, patient_id, hospital_id = consultation_ids
+        ids = dict(session_id=session_db_id, doctor_id=doctor_id, patient_id=patient_id, hospital_id=hospital_id)
+        rows = []
+        stt_usage = _STT_USAGE.get(stt_provider)
+        if stt_usage:
+            rows.append(_api_usage_row(stt_usage(stt_data[0], stt_data[2]), response_time_ms=stt_data[1], **ids))
+        rows.append(_api_usage_row(openai_chat_usage(openai_tokens[0], openai_tokens[1]), response_time_ms=openai_latency, **ids))
         if translation_data:
-            try:
-                await log_sarvam_translation(
-                    db=db,
-                    input_length=translation_data[0],
-                    output_length=translation_data[1],
-                    response_time_ms=translation_data[2],
-                    session_id=session_db_id,
-                    doctor_id=consultation.doctor_id,
-                    patient_id=consultation.patient_id,
-                    hospital_id=consultation.hospital_id
-                )
-            except Exception as e:
-                logger.error(f"Failed to log translation: {e}")
-        
-        # Log RAG
+            rows.append(_api_usage_row(
+                sarvam_translation_usage(translation_data[0], translation_data[1]),
+                response_time_ms=translation_data[2],
+                **ids
+            ))
         if rag_data:
-            try:
-                await log_rag_retrieval(
-                    db=db,
-                    context_length=rag_data[0],
-                    response_time_ms=rag_data[1],
-                    session_id=session_db_id,
-                    doctor_id=consultation.doctor_id,
-                    patient_id=consultation.patient_id,
-                    hospital_id=consultation.hospital_id
-                )
-            except Exception as e:
-                logger.error(f"Failed to log RAG retrieval: {e}")
+            rows.append(_api_usage_row(rag_retrieval_usage(rag_data[0]), response_time_ms=rag_data[1], **ids))
+        await _apply_session_usage(db, rows)
     except Exception as e:
         logger.error(f"Failed to log speech APIs: {e}")
+        await _safe_rollback(db, "consultation_sessions")
         # Don't raise - allow the request to continue
 
 
-async def log_tts_api(
+@_db_guard("api_usage_logs", "insert", "TTS logging")
+async def _log_tts_api(
+    db: AsyncSession,
     consultation_id: int,
-    session_id: str,
     provider: str,
     text_length: int,
     audio_size: int,
     response_time_ms: int
 ) -> None:
-    """Log TTS API usage with production-level error handling"""
-    try:
-        from database.database import AsyncSessionLocal
-        from sqlalchemy import select
-        from models.models import Consultation
-        from service.analytics_service import log_deepgram_tts, log_sarvam_tts
-        
-        try:
-            async with AsyncSessionLocal() as db:
-                try:
-                    session_db_id = await get_or_create_session(db, consultation_id=consultation_id, session_type="tts")
-                except (DisconnectionError, OperationalError) as e:
-                    logger.error(f"Database connection error while creating TTS session: {e}")
-                    raise DatabaseError("Database connection failed during TTS session creation", operation="insert", table="consultation_sessions", original_error=e)
-                
-                try:
-                    consultation_result = await db.execute(
-                        select(Consultation).where(Consultation.consultation_id == consultation_id)
-                    )
-                    consultation = consultation_result.scalar_one_or_none()
-                except (DisconnectionError, OperationalError) as e:
-                    logger.error(f"Database connection error while fetching consultation for TTS logging: {e}")
-                    raise DatabaseError("Database connection failed during consultation fetch", operation="select", table="consultation", original_error=e)
-                
-                if not consultation:
-                    logger.warning(f"Consultation {consultation_id} not found for TTS API logging")
-                    return
-                
-                try:
-                    if provider in ["deepgram", "deepgram-nova3"]:
-                        await log_deepgram_tts(
-                            db=db,
-                            text_length=text_length,
-                            audio_size=audio_size,
-                            response_time_ms=response_time_ms,
-                            session_id=session_db_id,
-                            doctor_id=consultation.doctor_id,
-                            patient_id=consultation.patient_id,
-                            hospital_id=consultation.hospital_id
-                        )
-                    else:
-                        await log_sarvam_tts(
-                            db=db,
-                            text_length=text_length,
-                            audio_size=audio_size,
-                            response_time_ms=response_time_ms,
-                            session_id=session_db_id,
-                            doctor_id=consultation.doctor_id,
-                            patient_id=consultation.patient_id,
-                            hospital_id=consultation.hospital_id
-                        )
-                    logger.debug(f"Logged TTS API usage for consultation {consultation_id} using {provider}")
-                except (DisconnectionError, OperationalError) as e:
-                    logger.error(f"Database connection error while logging TTS usage: {e}")
-                    raise DatabaseError("Database connection failed during TTS logging", operation="insert", table="api_usage_logs", original_error=e)
-        except (DisconnectionError, OperationalError) as e:
-            logger.error(f"Database session creation error in log_tts_api: {e}")
-            raise DatabaseError("Database session creation failed", operation="session", table="api_usage_logs", original_error=e)
-    
-    except IntegrityError as e:
-        logger.error(f"Integrity error in log_tts_api: {e}")
-        raise DatabaseError("Foreign key or constraint violation", operation="insert", table="api_usage_logs", original_error=e)
-    
-    except (DisconnectionError, OperationalError) as e:
-        logger.error(f"Database operational error in log_tts_api: {e}")
-        raise DatabaseError("Database connection or operational error", operation="insert", table="api_usage_logs", original_error=e)
+    session_db_id = await get_or_create_session(db, consultation_id=consultation_id, session_type="tts")
+    consultation_ids = await _get_consultation_ids(db, consultation_id)
+    if consultation_ids is None:
+        logger.warning(f"Consultation {consultation_id} not found for TTS API logging")
+        return
     
-    except SQLAlchemyDatabaseError as e:
-        logger.error(f"SQLAlchemy database error in log_tts_api: {e}")
-        raise DatabaseError("Database error during TTS logging", operation="insert", table="api_usage_logs", original_error=e)
-    
-    except Exception as e:
-        logger.error(f"Unexpected error in log_tts_api: {e}", exc_info=True)
-        raise DatabaseError("Unexpected error during TTS logging", operation="insert", table="api_usage_logs", original_error=e)
+    doctor_id, patient_id, hospital_id = consultation_ids
+    tts_usage = deepgram_tts_usage if provider in ["deepgram", "deepgram-nova3"] else sarvam_tts_usage
+    await _apply_session_usage(db, [_api_usage_row(
+        tts_usage(text_length, audio_size),
+        response_time_ms=response_time_ms,
+        session_id=session_db_id,
+        doctor_id=doctor_id,
+        patient_id=patient_id,
+        hospital_id=hospital_id
+    )])
+    logger.debug("Queued TTS API usage for consultation %s using %s", consultation_id, provider)
+
+
+async def log_tts_api(
+    consultation_id: int,
+    session_id: str,
+    provider: str,
+    text_length: int,
+    audio_size: int,
+    response_time_ms: int,
+    *,
+    db: Optional[AsyncSession] = None,
+) -> None:
+    """Log TTS API usage; runs on db when given, otherwise on a session of its own"""
+    if db is not None:
+        await _log_tts_api(db, consultation_id, provider, text_length, audio_size, response_time_ms)
+        return
+    async with AsyncSessionLocal() as own_db:
+        await _log_tts_api(own_db, consultation_id, provider, text_length, audio_size, response_time_ms)
 
 # Function removed - use close_session directly with better error handling in routes
\ No newline at end of file
@@ -1,6 +1,7 @@
 from typing import Optional, Dict, Any, List, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc
+from sqlalchemy import Row, select, delete, func, desc
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.exc import (
     IntegrityError,
     OperationalError,
@@ -17,10 +18,17 @@ from centralisedErrorHandling.ErrorHandling import (
     TransactionError
 )
 import logging
-from datetime import datetime, date
+from datetime import date
 
 logger = logging.getLogger(__name__)
 
+# Columns serialized into SpecialityOut; specialty listings return plain rows of these
+_SPECIALTY_OUT_COLUMNS = (Specialties.specialty_id, Specialties.name, Specialties.description, Specialties.status)
+
+# Fields update_doctor_profile may write on users / user_details
+_ALLOWED_USER = frozenset({"username", "email"})
+_ALLOWED_DETAILS = frozenset({"first_name", "last_name", "phone", "dob", "gender", "address"})
+
 
 async def _safe_rollback(db: AsyncSession, context: str) -> None:
     """Safely attempt database rollback with error handling"""
@@ -35,13 +43,22 @@ async def _safe_rollback(db: AsyncSession, context: str) -> None:
         logger.error(f"Unexpected error during rollback for {context}: {e}", exc_info=True)
 
 
+async def _get_user_with_details(db: AsyncSession, user_id: int) -> Tuple[Users, Optional[UserDetails]]:
+    """Load a user and their details row in one round-trip"""
+    res = await db.execute(
+        select(Users, UserDetails)
+        .outerjoin(UserDetails, UserDetails.user_id == Users.user_id)
+        .where(Users.user_id == int(user_id))
+    )
+    row = res.first()
+    if not row:
+        raise UserNotFoundError(user_id=user_id)
+    return row[0], row[1]
+
+
 async def get_doctor_profile(db: AsyncSession, user_id: int) -> Tuple[Users, Optional[UserDetails]]:
     try:
-        user = await db.get(Users, int(user_id))
-        if not user:
-            raise UserNotFoundError(user_id=user_id)
-        details = await db.get(UserDetails, int(user_id))
-        return user, details
+        return await _get_user_with_details(db, user_id)
     except UserNotFoundError:
         raise
     except Exception as e:
@@ -52,36 +69,35 @@ async def update_doctor_profile(db: AsyncSession, user_id: int, updates: Dict[st
     try:
         logger.info(f"Updating doctor profile for user_id={user_id} with updates: {updates}")
         
-        user = await db.get(Users, int(user_id))
-        if not user:
-            raise UserNotFoundError(user_id=user_id)
+        # Nothing to write: return the current profile without opening an update transaction
+        if not any(v is not None for k, v in (updates or {}).items() if k in _ALLOWED_USER or k in _ALLOWED_DETAILS):
+            logger.info(f"No updatable fields supplied for user_id={user_id}")
+            return await _get_user_with_details(db, user_id)
         
-        details = await db.get(UserDetails, int(user_id))
+        user, details = await _get_user_with_details(db, user_id)
         if not details:
             logger.info(f"Creating new UserDetails for user_id={user_id}")
             details = UserDetails(user_id=int(user_id))
             db.add(details)
         
-        allowed_user = {"username", "email"}
         changed = False
         
         # Update user fields
         for k, v in (updates or {}).items():
-            if k in allowed_user and v is not None and getattr(user, k) != v:
+            if k in _ALLOWED_USER and v is not None and getattr(user, k) != v:
                 logger.info(f"Updating user.{k}: {getattr(user, k)} -> {v}")
                 setattr(user, k, v)
                 changed = True
         
         # Update user_details fields
-        allowed_details = {"first_name", "last_name", "phone", "dob", "gender", "address"}
         for k, v in (updates or {}).items():
-            if k in allowed_details:
+            if k in _ALLOWED_DETAILS:
                 current_value = getattr(details, k, None)
                 
                 # Special handling for dob field - convert string to date
                 if k == "dob" and v is not None and isinstance(v, str):
                     try:
-                        v = datetime.fromisoformat(v.replace('Z', '+00:00')).date()
+                        v = date.fromisoformat(v[:10])
                         logger.info(f"Converted dob string to date: {v}")
                     except (ValueError, AttributeError) as e:
                         logger.warning(f"Failed to convert dob '{v}' to date: {e}")
@@ -97,8 +113,6 @@ async def update_doctor_profile(db: AsyncSession, user_id: int, updates: Dict[st
             db.add(user)
             db.add(details)
             await db.commit()
-            await db.refresh(user)
-            await db.refresh(details)
             logger.info(f"✅ Successfully updated doctor profile for user_id={user_id}")
         else:
             logger.info(f"No changes detected for user_id={user_id}")
@@ -120,40 +134,46 @@ async def update_doctor_profile(db: AsyncSession, user_id: int, updates: Dict[st
         )
 
 
-async def list_doctor_specialties(db: AsyncSession, user_id: int) -> List[Specialties]:
+async def list_doctor_specialties(db: AsyncSession, user_id: int) -> List[Row]:
     try:
         q = (
-            select(Specialties)
+            select(*_SPECIALTY_OUT_COLUMNS)
             .join(DoctorSpecialties, DoctorSpecialties.specialty_id == Specialties.specialty_id)
             .where(DoctorSpecialties.user_id == int(user_id))
             .order_by(Specialties.name)
         )
         res = await db.execute(q)
-        return list(res.scalars().all())
+        return list(res.all())
     except Exception as e:
         raise DatabaseError("Failed to list doctor specialties", operation="select", table="doctor_specialties/specialties", original_error=e)
 
 
-async def assign_doctor_specialties(db: AsyncSession, user_id: int, specialty_ids: List[int]) -> List[Specialties]:
+async def assign_doctor_specialties(db: AsyncSession, user_id: int, specialty_ids: List[int]) -> List[Row]:
     try:
-        # fetch existing
-        existing_q = select(DoctorSpecialties).where(DoctorSpecialties.user_id == int(user_id))
-        res = await db.execute(existing_q)
-        existing = {int(ds.specialty_id): ds for ds in res.scalars().all()}
+        uid = int(user_id)
         keep = set(int(s) for s in (specialty_ids or []))
 
         # delete removed
-        for sid, row in list(existing.items()):
-            if sid not in keep:
-                await db.delete(row)
-        # add new
-        for sid in keep:
-            if sid not in existing:
-                db.add(DoctorSpecialties(user_id=int(user_id), specialty_id=int(sid)))
+        await db.execute(
+            delete(DoctorSpecialties).where(
+                DoctorSpecialties.user_id == uid,
+                DoctorSpecialties.specialty_id.notin_(keep)
+            )
+        )
+        # add new; rows already assigned hit uq_ds_user_spec and are left as they are
+        if keep:
+            stmt = mysql_insert(DoctorSpecialties).values(
+                [{"user_id": uid, "specialty_id": sid} for sid in keep]
+            )
+            await db.execute(stmt.on_duplicate_key_update(specialty_id=stmt.inserted.specialty_id))
 
         await db.commit()
 
-        return await list_doctor_specialties(db, user_id)
+        # The assigned ids are already known; load them without re-joining doctor_specialties
+        if not keep:
+            return []
+        res = await db.execute(select(*_SPECIALTY_OUT_COLUMNS).where(Specialties.specialty_id.in_(keep)).order_by(Specialties.name))
+        return list(res.all())
     except (DataIntegrityError, ConnectionError, TransactionError):
         raise
     except Exception as e:
@@ -168,58 +188,79 @@ async def assign_doctor_specialties(db: AsyncSession, user_id: int, specialty_id
         )
 
 
-async def list_patients_for_doctor(db: AsyncSession, doctor_id: int, limit: int = 200) -> List[Users]:
+async def list_patients_for_doctor(db: AsyncSession, doctor_id: int, limit: int = 200) -> List[Row]:
     try:
-        q = (
-            select(Users)
-            .join(Consultation, Consultation.patient_id == Users.user_id)
+        # Latest consultation per patient via ROW_NUMBER over the doctor's rows, read from
+        # idx_consult_doctor_date_patient; only the top page is joined to users.
+        # Plain rows with only the listed columns; no ORM instances for a read-only listing
+        latest = (
+            select(
+                Consultation.patient_id,
+                Consultation.consultation_date,
+                func.row_number().over(
+                    partition_by=Consultation.patient_id,
+                    order_by=desc(Consultation.consultation_date)
+                ).label("rn"),
+            )
             .where(Consultation.doctor_id == int(doctor_id))
-            .group_by(Users.user_id)
-            .order_by(desc(func.max(Consultation.consultation_date)))
+            .subquery()
+        )
+        q = (
+            select(Users.user_id, Users.username, Users.email)
+            .join(latest, latest.c.patient_id == Users.user_id)
+            .where(latest.c.rn == 1)
+            .order_by(desc(latest.c.consultation_date))
             .limit(int(limit))
         )
         res = await db.execute(q)
-        return list(res.scalars().all())
+        return list(res.all())
     except Exception as e:
         raise DatabaseError("Failed to list doctor patients", operation="select", table="users/consultation", original_error=e)
 
 
 async def get_patient_details(db: AsyncSession, patient_id: int) -> Tuple[Users, Optional[UserDetails]]:
     try:
-        user = await db.get(Users, int(patient_id))
-        if not user:
-            raise UserNotFoundError(user_id=patient_id)
-        details = await db.get(UserDetails, int(patient_id))
-        return user, details
+        return await _get_user_with_details(db, patient_id)
     except UserNotFoundError:
         raise
     except Exception as e:
         raise DatabaseError("Failed to fetch patient details", operation="select", table="users/user_details", original_error=e)
 
 
-async def list_patient_consultations_for_doctor(db: AsyncSession, doctor_id: int, patient_id: int, limit: int = 200) -> List[Consultation]:
+async def list_patient_consultations_for_doctor(db: AsyncSession, doctor_id: int, patient_id: int, limit: int = 200) -> List[Row]:
     try:
+        # Plain rows with only the listed columns; no ORM instances for a read-only listing
         q = (
-            select(Consultation)
+            select(
+                Consultation.consultation_id,
+                Consultation.patient_id,
+                Consultation.doctor_id,
+                Consultation.hospital_id,
+                Consultation.specialty_id,
+                Consultation.consultation_date,
+                Consultation.status,
+                Consultation.total_duration,
+            )
             .where(Consultation.doctor_id == int(doctor_id), Consultation.patient_id == int(patient_id))
             .order_by(desc(Consultation.consultation_date))
             .limit(int(limit))
         )
         res = await db.execute(q)
-        return list(res.scalars().all())
+        return list(res.all())
     except Exception as e:
         raise DatabaseError("Failed to list consultations", operation="select", table="consultation", original_error=e)
 
 
 async def analytics_patients(db: AsyncSession, doctor_id: int) -> Dict[str, Any]:
     try:
-        total_consults = await db.execute(select(func.count()).select_from(Consultation).where(Consultation.doctor_id == int(doctor_id)))
-        total_patients = await db.execute(
-            select(func.count(func.distinct(Consultation.patient_id))).where(Consultation.doctor_id == int(doctor_id))
+        res = await db.execute(
+            select(func.count(), func.count(func.distinct(Consultation.patient_id)))
+            .where(Consultation.doctor_id == int(doctor_id))
         )
+        total_consults, total_patients = res.one()
         return {
-            "total_consultations": int(total_consults.scalar() or 0),
-            "total_unique_patients": int(total_patients.scalar() or 0),
+            "total_consultations": int(total_consults or 0),
+            "total_unique_patients": int(total_patients or 0),
         }
     except Exception as e:
         raise DatabaseError("Failed to compute analytics", operation="aggregate", table="consultation", original_error=e)
@@ -227,14 +268,12 @@ async def analytics_patients(db: AsyncSession, doctor_id: int) -> Dict[str, Any]
 
 async def consultations_monthly(db: AsyncSession, doctor_id: int) -> List[Dict[str, Any]]:
     try:
+        # consultation_month is a stored generated column, so grouping walks idx_consult_doctor_month
         q = (
-            select(
-                func.date_format(Consultation.consultation_date, "%Y-%m").label("month"),
-                func.count().label("count"),
-            )
+            select(Consultation.consultation_month, func.count())
             .where(Consultation.doctor_id == int(doctor_id))
-            .group_by("month")
-            .order_by("month")
+            .group_by(Consultation.consultation_month)
+            .order_by(Consultation.consultation_month)
         )
         res = await db.execute(q)
         rows = res.all()
@@ -1,5 +1,6 @@
 import logging
-from sqlalchemy import select
+import time
+from sqlalchemy import select, insert, exists, union_all, literal, bindparam
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 from sqlalchemy.exc import IntegrityError
@@ -13,12 +14,40 @@ from models.models import (
     RoleMaster,
     HospitalRolePermission,
     PermissionMaster,
+    DoctorSpecialties,
+    Specialties,
+    HospitalSpecialties,
+    PatientHospitals,
+    t_doctor_hospitals,
 )
 from utils.utils import generate_passwd_hash
 from utils.validators import validate_email, validate_name, validate_password
 
 logger = logging.getLogger(__name__)
 
+# Default permission ids per role name; permission master data rarely changes, so the
+# name -> id resolution is cached for a while instead of selected on every user creation
+_DEFAULT_PERM_IDS_TTL = 300
+_default_perm_ids_cache: dict = {}
+
+# hospital_admin_create_user lookups, built once: hospital, email/username uniqueness,
+# tenant role and global role (plus the doctor fallback) in one round-trip, with every
+# branch tagged with what it found
+_CREATE_USER_LOOKUP = union_all(
+    select(literal("hospital").label("k"), HospitalMaster.hospital_id.label("v"))
+    .where(HospitalMaster.hospital_id == bindparam("hospital_id")),
+    select(literal("email"), Users.user_id).where(Users.email == bindparam("email")),
+    select(literal("username"), Users.user_id).where(Users.username == bindparam("username")),
+    select(literal("tenant_role:") + HospitalRole.role_name, HospitalRole.hospital_role_id).where(
+        HospitalRole.hospital_id == bindparam("hospital_id"),
+        HospitalRole.role_name == bindparam("role_name")
+    ),
+    select(literal("role:") + RoleMaster.role_name, RoleMaster.role_id).where(
+        RoleMaster.role_name.in_([bindparam("global_role"), "doctor"])
+    ),
+    select(literal("specialty"), Specialties.specialty_id).where(Specialties.name == bindparam("specialty")),
+)
+
 
 def get_default_permissions_for_role(role_name: str) -> list:
     """
@@ -52,6 +81,23 @@ def get_default_permissions_for_role(role_name: str) -> list:
     return default_permissions.get(role_name, [])
 
 
+async def _resolve_default_perm_ids(db: AsyncSession, role_name: str, permission_names: list) -> list:
+    """Return the permission ids for a role's default permission names"""
+    cached = _default_perm_ids_cache.get(role_name)
+    if cached is not None and cached[0] > time.time():
+        return cached[1]
+
+    perm_q = await db.execute(
+        select(PermissionMaster.permission_id).where(
+            PermissionMaster.permission_name.in_(permission_names)
+        )
+    )
+    perm_ids = [pid for (pid,) in perm_q.all() if pid is not None]
+    if perm_ids:
+        _default_perm_ids_cache[role_name] = (time.time() + _DEFAULT_PERM_IDS_TTL, perm_ids)
+    return perm_ids
+
+
 async def hospital_admin_create_user(
     db: AsyncSession,
     actor_user: dict,
@@ -78,7 +124,8 @@ async def hospital_admin_create_user(
 
 
     # Check if user is superadmin (bypass hospital check) or validate hospital access
-    user_role = actor_user.get("global_role", {}).get("role_name")
+    # Token payloads carry "global_role": None for hospital-only users
+    user_role = (actor_user.get("global_role") or {}).get("role_name")
     if user_role != "superadmin":
         # For hospital admins, check if they belong to this hospital
         admin_hospital_id = actor_user.get("hospital_id")
@@ -87,27 +134,47 @@ async def hospital_admin_create_user(
                                 detail="You are not authorized to create users in this hospital")
 
     
-    hospital_q = await db.execute(select(HospitalMaster).where(HospitalMaster.hospital_id == hospital_id))
-    hospital = hospital_q.scalar_one_or_none()
-    if not hospital:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Hospital not found")
+    # Map tenant role to global role
+    # Standard roles map directly, custom roles default based on context
+    role_mapping = {
+        "doctor": "doctor",
+        "patient": "patient",
+        "hospital_admin": "hospital_admin",
+    }
+    
+    # For custom roles, we need to infer the global role
+    # If it's a custom role, default to 'doctor' as it's staff-level access
+    global_role_name = role_mapping.get((role_name or "").lower(), "doctor")
+
+    lookup_q = await db.execute(
+        _CREATE_USER_LOOKUP,
+        {
+            "hospital_id": hospital_id,
+            "email": email,
+            "username": username,
+            "role_name": role_name,
+            "global_role": global_role_name,
+            "specialty": specialty,
+        }
+    )
+    found = {k: v for k, v in lookup_q.all()}
 
+    if "hospital" not in found:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Hospital not found")
 
-    q = await db.execute(select(Users).where(Users.email == email))
-    if q.scalar_one_or_none():
+    if "email" in found:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="User with this email already exists")
 
-    q = await db.execute(select(Users).where(Users.username == username))
-    if q.scalar_one_or_none():
+    if "username" in found:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="User with this username already exists")
 
 
-    q = await db.execute(select(HospitalRole).where(
-        HospitalRole.hospital_id == hospital_id,
-        HospitalRole.role_name == role_name
-    ))
-    tenant_role = q.scalar_one_or_none()
-    if not tenant_role:
+    # The role_name match is collation-insensitive, so report the stored name, not the input
+    tenant_role_name, tenant_role_id = next(
+        ((k[len("tenant_role:"):], v) for k, v in found.items() if k.startswith("tenant_role:")),
+        (role_name, None),
+    )
+    if not tenant_role_id:
         # Create custom tenant role if missing
         tenant_role = HospitalRole(
             hospital_id=hospital_id,
@@ -116,57 +183,24 @@ async def hospital_admin_create_user(
         )
         db.add(tenant_role)
         await db.flush()
+        tenant_role_id = tenant_role.hospital_role_id
         
         # Assign default permissions to the new role
         default_permissions = get_default_permissions_for_role(role_name)
         if default_permissions:
-            # Get permission IDs for the default permissions
-            perm_q = await db.execute(
-                select(PermissionMaster.permission_id).where(
-                    PermissionMaster.permission_name.in_(default_permissions)
-                )
-            )
-            perm_id_tuples = perm_q.all()
-            perm_ids = [pid for (pid,) in perm_id_tuples if pid is not None]
+            perm_ids = await _resolve_default_perm_ids(db, role_name, default_permissions)
             
-            # Assign permissions to the role
-            for pid in perm_ids:
-                hrp = HospitalRolePermission(
-                    hospital_role_id=tenant_role.hospital_role_id,
-                    permission_id=pid
+            # Assign permissions to the role in one multi-row INSERT
+            if perm_ids:
+                await db.execute(
+                    insert(HospitalRolePermission),
+                    [{"hospital_role_id": tenant_role_id, "permission_id": pid} for pid in perm_ids]
                 )
-                db.add(hrp)
-            
-            await db.flush()
             logger.info("Assigned %d default permissions to new role '%s' for hospital %s", len(perm_ids), role_name, hospital_id)
 
 
-    # Map tenant role to global role
-    # Standard roles map directly, custom roles default based on context
-    from models.models import RoleMaster
-    
-    # Define mapping of tenant roles to global roles
-    role_mapping = {
-        "doctor": "doctor",
-        "patient": "patient",
-        "hospital_admin": "hospital_admin",
-    }
-    
-    # For custom roles, we need to infer the global role
-    # If it's a custom role, default to 'doctor' as it's staff-level access
-    global_role_name = role_mapping.get(role_name.lower(), "doctor")
-    
-    role_master_query = select(RoleMaster).where(RoleMaster.role_name == global_role_name)
-    role_master_result = await db.execute(role_master_query)
-    role_master = role_master_result.scalar_one_or_none()
-    
-    if not role_master:
-        # Fallback to doctor role if mapping fails
-        role_master_query = select(RoleMaster).where(RoleMaster.role_name == "doctor")
-        role_master_result = await db.execute(role_master_query)
-        role_master = role_master_result.scalar_one_or_none()
-    
-    global_role_id = role_master.role_id if role_master else 3  # Default to doctor (3)
+    # Fallback to doctor role if mapping fails
+    global_role_id = found.get(f"role:{global_role_name}") or found.get("role:doctor") or 3  # Default to doctor (3)
     logger.info(f"🔍 Found global_role_id {global_role_id} for role '{role_name}'")
     
     hashed = generate_passwd_hash(password)
@@ -181,19 +215,19 @@ async def hospital_admin_create_user(
     logger.info(f"✅ Created user {user.user_id} with global_role_id {global_role_id}")
 
 
+    # Rows below only need ids that are already known; they are written together
+    # by the final commit instead of one flush each
     ud = UserDetails(user_id=user.user_id, first_name=first_name, last_name=last_name, phone=phone)
     db.add(ud)
-    await db.flush()
 
 
     hur = HospitalUserRoles(
         hospital_id=hospital_id,
         user_id=user.user_id,
-        hospital_role_id=tenant_role.hospital_role_id,
+        hospital_role_id=tenant_role_id,
         is_active=True
     )
     db.add(hur)
-    await db.flush()
 
     # Handle specialty assignment for doctors
     logger.info(f"🔍 Checking specialty assignment: role_name='{role_name}', specialty='{specialty}'")
@@ -202,15 +236,11 @@ async def hospital_admin_create_user(
     if role_name and role_name.lower() == "doctor" and specialty and specialty.strip():
         logger.info(f"✅ ENTERING specialty assignment block for doctor with specialty '{specialty}'")
         try:
-            from models.models import DoctorSpecialties, Specialties, HospitalSpecialties
-            
-            # Find specialty by name (case-insensitive)
-            specialty_query = select(Specialties).where(Specialties.name == specialty)
-            specialty_result = await db.execute(specialty_query)
-            specialty_obj = specialty_result.scalar_one_or_none()
+            # Specialty id was resolved by the consolidated lookup above
+            specialty_id = found.get("specialty")
             
             # **AUTO-CREATE SPECIALTY** if it doesn't exist in the database
-            if not specialty_obj:
+            if not specialty_id:
                 logger.warning(f"⚠️ Specialty '{specialty}' not found in database, creating it automatically")
                 specialty_obj = Specialties(
                     name=specialty,
@@ -219,35 +249,32 @@ async def hospital_admin_create_user(
                 )
                 db.add(specialty_obj)
                 await db.flush()
-                logger.info(f"✅ Created new specialty '{specialty}' (ID: {specialty_obj.specialty_id})")
+                specialty_id = specialty_obj.specialty_id
+                logger.info(f"✅ Created new specialty '{specialty}' (ID: {specialty_id})")
             
             # Create doctor specialty relationship
             doctor_specialty = DoctorSpecialties(
                 user_id=user.user_id,
-                specialty_id=specialty_obj.specialty_id
+                specialty_id=specialty_id
             )
             db.add(doctor_specialty)
-            await db.flush()
-            logger.info(f"✅ Assigned specialty '{specialty}' (ID: {specialty_obj.specialty_id}) to doctor {user.user_id}")
+            logger.info(f"✅ Assigned specialty '{specialty}' (ID: {specialty_id}) to doctor {user.user_id}")
             
             # **CRITICAL**: Also add specialty to hospital_specialties if not already present
             # This enables patients to see this specialty in their hospital
-            hospital_specialty_query = select(HospitalSpecialties).where(
+            hospital_specialty_exists = await db.scalar(select(exists().where(
                 HospitalSpecialties.hospital_id == hospital_id,
-                HospitalSpecialties.specialty_id == specialty_obj.specialty_id
-            )
-            hospital_specialty_result = await db.execute(hospital_specialty_query)
-            existing_hospital_specialty = hospital_specialty_result.scalar_one_or_none()
+                HospitalSpecialties.specialty_id == specialty_id
+            )))
             
-            if not existing_hospital_specialty:
+            if not hospital_specialty_exists:
                 # Add specialty to hospital
                 hospital_specialty = HospitalSpecialties(
                     hospital_id=hospital_id,
-                    specialty_id=specialty_obj.specialty_id,
+                    specialty_id=specialty_id,
                     is_primary=0
                 )
                 db.add(hospital_specialty)
-                await db.flush()
                 logger.info(f"✅ Added specialty '{specialty}' to hospital_specialties for hospital_id={hospital_id}")
             else:
                 logger.info(f"ℹ️ Specialty '{specialty}' already exists in hospital_specialties for hospital_id={hospital_id}")
@@ -260,16 +287,12 @@ async def hospital_admin_create_user(
     # This enables tenant isolation and proper data filtering
     if role_name.lower() == "doctor":
         try:
-            from models.models import t_doctor_hospitals
-            from sqlalchemy import insert
-            
             # Insert into doctor_hospitals junction table
             stmt = insert(t_doctor_hospitals).values(
                 user_id=user.user_id,
                 hospital_id=hospital_id
             )
             await db.execute(stmt)
-            await db.flush()
             logger.info(f"✅ Associated doctor user_id={user.user_id} with hospital_id={hospital_id} in doctor_hospitals table")
         except Exception as e:
             logger.error(f"❌ Failed to associate doctor with hospital in doctor_hospitals: {e}")
@@ -277,8 +300,6 @@ async def hospital_admin_create_user(
     
     elif role_name.lower() == "patient":
         try:
-            from models.models import PatientHospitals
-            
             # Insert into patient_hospitals junction table
             patient_hospital = PatientHospitals(
                 user_id=user.user_id,
@@ -286,7 +307,6 @@ async def hospital_admin_create_user(
                 is_active=1
             )
             db.add(patient_hospital)
-            await db.flush()
             logger.info(f"✅ Associated patient user_id={user.user_id} with hospital_id={hospital_id} in patient_hospitals table")
         except Exception as e:
             logger.error(f"❌ Failed to associate patient with hospital in patient_hospitals: {e}")
@@ -299,7 +319,7 @@ async def hospital_admin_create_user(
         "username": user.username,
         "email": user.email,
         "hospital_id": hospital_id,
-        "tenant_role": tenant_role.role_name
+        "tenant_role": tenant_role_name
     }
 async def create_custom_hospital_role(db: AsyncSession, hospital_id: int, payload: dict, actor_user: dict):
     """
@@ -309,8 +329,7 @@ async def create_custom_hospital_role(db: AsyncSession, hospital_id: int, payloa
     desc = payload.get("description", None)
 
     # Verify role doesn't exist already
-    q = await db.execute(select(HospitalRole).where(HospitalRole.hospital_id == hospital_id, HospitalRole.role_name == role_name))
-    if q.scalar_one_or_none():
+    if await db.scalar(select(exists().where(HospitalRole.hospital_id == hospital_id, HospitalRole.role_name == role_name))):
         raise HTTPException(status_code=409, detail="Role already exists")
 
     hr = HospitalRole(hospital_id=hospital_id, role_name=role_name, description=desc)
@@ -330,16 +349,18 @@ async def assign_permissions_to_hospital_role(db: AsyncSession, hospital_id: int
     Assign selected permissions to a hospital-specific role.
     """
     # Verify role belongs to hospital
-    q = await db.execute(select(HospitalRole).where(
+    role_exists = await db.scalar(select(exists().where(
         HospitalRole.hospital_role_id == role_id,
         HospitalRole.hospital_id == hospital_id
-    ))
-    hr = q.scalar_one_or_none()
-    if not hr:
+    )))
+    if not role_exists:
         raise HTTPException(status_code=404, detail="Role not found for this hospital")
 
-    for pid in permission_ids:
-        db.add(HospitalRolePermission(hospital_role_id=role_id, permission_id=pid))
+    if permission_ids:
+        await db.execute(
+            insert(HospitalRolePermission),
+            [{"hospital_role_id": role_id, "permission_id": pid} for pid in permission_ids]
+        )
 
     await db.commit()
     return {"role_id": role_id, "assigned_permissions": len(permission_ids)}
@@ -1,13 +1,13 @@
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Sequence
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, insert, update, delete, and_, bindparam
 from sqlalchemy.exc import (
     IntegrityError,
     OperationalError,
     DisconnectionError,
     InvalidRequestError
 )
-from models.models import HospitalMaster, Specialties, Users, HospitalUserRoles, DoctorSpecialties
+from models.models import HospitalMaster, Specialties, Users, HospitalUserRoles, HospitalRole, DoctorSpecialties
 from centralisedErrorHandling.ErrorHandling import (
     DatabaseError,
     ValidationError,
@@ -20,6 +20,42 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Prebuilt statements for the doctor lifecycle helpers; values are bound per call
+_HUR_BY_HOSPITAL_USER = select(HospitalUserRoles).where(
+    and_(
+        HospitalUserRoles.hospital_id == bindparam("hospital_id"),
+        HospitalUserRoles.user_id == bindparam("user_id"),
+    )
+)
+_DELETE_HUR_BY_HOSPITAL_USER = delete(HospitalUserRoles).where(
+    and_(
+        HospitalUserRoles.hospital_id == bindparam("hospital_id"),
+        HospitalUserRoles.user_id == bindparam("user_id"),
+    )
+)
+_DOCTOR_SPECIALTY_IDS = select(DoctorSpecialties.specialty_id).where(DoctorSpecialties.user_id == bindparam("user_id"))
+# Doctor role OR custom roles (excluding patient and hospital_admin), joined straight onto
+# users so the listing is a single round-trip. Custom roles are treated as staff/doctor-level access;
+# the excluded hospital_role ids come from a NOT IN subquery, so hospital_role stays out of the
+# join and roles created at runtime are seen on the next call
+_NON_DOCTOR_ROLE_IDS = select(HospitalRole.hospital_role_id).where(
+    HospitalRole.hospital_id == bindparam("hospital_id"),
+    HospitalRole.role_name.in_(["patient", "hospital_admin"])
+)
+_HOSPITAL_DOCTORS = (
+    select(Users)
+    .join(HospitalUserRoles, HospitalUserRoles.user_id == Users.user_id)
+    .where(
+        and_(
+            HospitalUserRoles.hospital_id == bindparam("hospital_id"),
+            HospitalUserRoles.is_active == 1,
+            HospitalUserRoles.hospital_role_id.notin_(_NON_DOCTOR_ROLE_IDS)
+        )
+    )
+    .distinct()
+    .limit(bindparam("limit"))
+)
+
 
 async def _safe_rollback(db: AsyncSession, context: str) -> None:
     """Safely attempt database rollback with error handling"""
@@ -43,30 +79,28 @@ async def get_hospital_profile(db: AsyncSession, hospital_id: int) -> Optional[H
 
 
 async def update_hospital_profile(db: AsyncSession, hospital_id: int, update_data: Dict[str, Any]) -> HospitalMaster:
-    try:
-        hospital: Optional[HospitalMaster] = await db.get(HospitalMaster, int(hospital_id))
-    except Exception as e:
-        raise DatabaseError("Failed to fetch hospital", operation="select", table="hospital_master", original_error=e)
-
-    if not hospital:
-        raise ValidationError("Hospital not found", field="hospital_id", value=hospital_id)
-
     allowed = {"hospital_name", "hospital_email", "admin_contact", "address"}
-    changed = False
-    for k, v in (update_data or {}).items():
-        if k in allowed and getattr(hospital, k) != v:
-            setattr(hospital, k, v)
-            changed = True
-
-    if not changed:
+    values = {k: v for k, v in (update_data or {}).items() if k in allowed}
+
+    if not values:
+        try:
+            hospital: Optional[HospitalMaster] = await db.get(HospitalMaster, int(hospital_id))
+        except Exception as e:
+            raise DatabaseError("Failed to fetch hospital", operation="select", table="hospital_master", original_error=e)
+        if not hospital:
+            raise ValidationError("Hospital not found", field="hospital_id", value=hospital_id)
         return hospital
 
     try:
-        db.add(hospital)
+        # Write straight to the row; the single read afterwards picks up updated_at
+        res = await db.execute(
+            update(HospitalMaster).where(HospitalMaster.hospital_id == int(hospital_id)).values(**values)
+        )
+        if res.rowcount == 0:
+            raise ValidationError("Hospital not found", field="hospital_id", value=hospital_id)
         await db.commit()
-        await db.refresh(hospital)
-        return hospital
-    except (DataIntegrityError, ConnectionError, TransactionError):
+        return await db.get(HospitalMaster, int(hospital_id), populate_existing=True)
+    except (ValidationError, DataIntegrityError, ConnectionError, TransactionError):
         raise
     except Exception as e:
         await _safe_rollback(db, "hospital_master")
@@ -80,11 +114,11 @@ async def update_hospital_profile(db: AsyncSession, hospital_id: int, update_dat
         )
 
 
-async def list_specialities(db: AsyncSession, limit: int = 500) -> List[Specialties]:
+async def list_specialities(db: AsyncSession, limit: int = 500) -> Sequence[Specialties]:
     try:
         q = select(Specialties).limit(int(limit))
         res = await db.execute(q)
-        return list(res.scalars().all())
+        return res.scalars().all()
     except Exception as e:
         raise DatabaseError("Failed to list specialties", operation="select", table="specialties", original_error=e)
 
@@ -114,34 +148,32 @@ async def create_speciality(db: AsyncSession, *, name: str, description: Optiona
 
 
 async def update_speciality(db: AsyncSession, specialty_id: int, *, name: Optional[str] = None, description: Optional[str] = None, status: Optional[str] = None) -> Specialties:
-    try:
-        row: Optional[Specialties] = await db.get(Specialties, int(specialty_id))
-    except Exception as e:
-        raise DatabaseError("Failed to fetch specialty", operation="select", table="specialties", original_error=e)
-
-    if not row:
-        raise ValidationError("Specialty not found", field="specialty_id", value=specialty_id)
-
-    changed = False
-    if name is not None and name.strip() and row.name != name.strip():
-        row.name = name.strip()
-        changed = True
-    if description is not None and row.description != description:
-        row.description = description
-        changed = True
-    if status is not None and row.status != status:
-        row.status = status
-        changed = True
-
-    if not changed:
+    values: Dict[str, Any] = {}
+    if name is not None and name.strip():
+        values["name"] = name.strip()
+    if description is not None:
+        values["description"] = description
+    if status is not None:
+        values["status"] = status
+
+    if not values:
+        try:
+            row: Optional[Specialties] = await db.get(Specialties, int(specialty_id))
+        except Exception as e:
+            raise DatabaseError("Failed to fetch specialty", operation="select", table="specialties", original_error=e)
+        if not row:
+            raise ValidationError("Specialty not found", field="specialty_id", value=specialty_id)
         return row
 
     try:
-        db.add(row)
+        res = await db.execute(
+            update(Specialties).where(Specialties.specialty_id == int(specialty_id)).values(**values)
+        )
+        if res.rowcount == 0:
+            raise ValidationError("Specialty not found", field="specialty_id", value=specialty_id)
         await db.commit()
-        await db.refresh(row)
-        return row
-    except (DataIntegrityError, ConnectionError, TransactionError):
+        return await db.get(Specialties, int(specialty_id), populate_existing=True)
+    except (ValidationError, DataIntegrityError, ConnectionError, TransactionError):
         raise
     except Exception as e:
         await _safe_rollback(db, "specialties")
@@ -193,8 +225,10 @@ async def add_doctor_to_hospital(
     doctor_user_id: int,
     hospital_role_id: Optional[int] = None,
 ) -> HospitalUserRoles:
+    hospital_id = int(hospital_id)
+    doctor_user_id = int(doctor_user_id)
     try:
-        user = await db.get(Users, int(doctor_user_id))
+        user = await db.get(Users, doctor_user_id)
     except Exception as e:
         raise DatabaseError("Failed to fetch user", operation="select", table="users", original_error=e)
     if not user:
@@ -202,20 +236,14 @@ async def add_doctor_to_hospital(
 
     if hospital_role_id is None:
         raise ValidationError("hospital_role_id is required", field="hospital_role_id")
+    hospital_role_id = int(hospital_role_id)
 
     try:
         # If a mapping for user and hospital exists with any role, keep a single active mapping; update role if provided
-        q = select(HospitalUserRoles).where(
-            and_(
-                HospitalUserRoles.hospital_id == int(hospital_id),
-                HospitalUserRoles.user_id == int(doctor_user_id),
-            )
-        )
-        res = await db.execute(q)
+        res = await db.execute(_HUR_BY_HOSPITAL_USER, {"hospital_id": hospital_id, "user_id": doctor_user_id})
         hur = res.scalars().first()
         if hur:
-            if hospital_role_id is not None:
-                hur.hospital_role_id = int(hospital_role_id)
+            hur.hospital_role_id = hospital_role_id
             hur.is_active = 1
             db.add(hur)
             await db.commit()
@@ -224,9 +252,9 @@ async def add_doctor_to_hospital(
 
         # create new mapping
         new_hur = HospitalUserRoles(
-            hospital_id=int(hospital_id),
-            user_id=int(doctor_user_id),
-            hospital_role_id=int(hospital_role_id),
+            hospital_id=hospital_id,
+            user_id=doctor_user_id,
+            hospital_role_id=hospital_role_id,
             is_active=1,
         )
         db.add(new_hur)
@@ -256,8 +284,10 @@ async def update_doctor_in_hospital(
     new_hospital_role_id: Optional[int] = None,
     specialty_ids: Optional[List[int]] = None,
 ) -> Users:
+    hospital_id = int(hospital_id)
+    doctor_user_id = int(doctor_user_id)
     try:
-        user = await db.get(Users, int(doctor_user_id))
+        user = await db.get(Users, doctor_user_id)
     except Exception as e:
         raise DatabaseError("Failed to fetch user", operation="select", table="users", original_error=e)
     if not user:
@@ -266,41 +296,40 @@ async def update_doctor_in_hospital(
     try:
         # Update mapping role if provided
         if new_hospital_role_id is not None:
-            q = select(HospitalUserRoles).where(
-                and_(
-                    HospitalUserRoles.hospital_id == int(hospital_id),
-                    HospitalUserRoles.user_id == int(doctor_user_id),
-                )
-            )
-            res = await db.execute(q)
+            new_hospital_role_id = int(new_hospital_role_id)
+            res = await db.execute(_HUR_BY_HOSPITAL_USER, {"hospital_id": hospital_id, "user_id": doctor_user_id})
             hur = res.scalars().first()
             if not hur:
                 hur = HospitalUserRoles(
-                    hospital_id=int(hospital_id),
-                    user_id=int(doctor_user_id),
-                    hospital_role_id=int(new_hospital_role_id),
+                    hospital_id=hospital_id,
+                    user_id=doctor_user_id,
+                    hospital_role_id=new_hospital_role_id,
                     is_active=1,
                 )
             else:
-                hur.hospital_role_id = int(new_hospital_role_id)
+                hur.hospital_role_id = new_hospital_role_id
                 hur.is_active = 1
             db.add(hur)
 
         # Update specialties if provided: upsert provided and remove others for the doctor
         if specialty_ids is not None:
-            # Fetch existing for doctor
-            q = select(DoctorSpecialties).where(DoctorSpecialties.user_id == int(doctor_user_id))
-            res = await db.execute(q)
-            existing = {int(ds.specialty_id): ds for ds in res.scalars().all()}
-            keep = set(int(s) for s in specialty_ids)
-            # delete removed
-            for sid, row in list(existing.items()):
-                if sid not in keep:
-                    await db.delete(row)
-            # add new
-            for sid in keep:
-                if sid not in existing:
-                    db.add(DoctorSpecialties(user_id=int(doctor_user_id), specialty_id=int(sid)))
+            # Fetch existing specialty ids for doctor
+            res = await db.execute(_DOCTOR_SPECIALTY_IDS, {"user_id": doctor_user_id})
+            existing = set(res.scalars().all())
+            keep = {int(s) for s in specialty_ids}
+            # delete removed in one statement
+            to_remove = existing - keep
+            if to_remove:
+                await db.execute(
+                    delete(DoctorSpecialties).where(
+                        DoctorSpecialties.user_id == doctor_user_id,
+                        DoctorSpecialties.specialty_id.in_(to_remove)
+                    )
+                )
+            # add new in one executemany
+            to_add = [{"user_id": doctor_user_id, "specialty_id": sid} for sid in keep - existing]
+            if to_add:
+                await db.execute(insert(DoctorSpecialties), to_add)
 
         # Update basic fields on Users (only username/email allowed here)
         allowed = {"username", "email"}
@@ -331,17 +360,10 @@ async def update_doctor_in_hospital(
 
 async def remove_doctor_from_hospital(db: AsyncSession, *, hospital_id: int, doctor_user_id: int) -> None:
     try:
-        q = select(HospitalUserRoles).where(
-            and_(
-                HospitalUserRoles.hospital_id == int(hospital_id),
-                HospitalUserRoles.user_id == int(doctor_user_id),
-            )
-        )
-        res = await db.execute(q)
-        hur = res.scalars().first()
-        if not hur:
+        res = await db.execute(_DELETE_HUR_BY_HOSPITAL_USER, {"hospital_id": int(hospital_id), "user_id": int(doctor_user_id)})
+        if not res.rowcount:
+            # treat as idempotent delete
             return
-        await db.delete(hur)
         await db.commit()
     except (DataIntegrityError, ConnectionError, TransactionError):
         raise
@@ -363,49 +385,15 @@ async def list_hospital_doctors(db: AsyncSession, *, hospital_id: int, limit: in
     Only returns users who have the 'doctor' role assigned in hospital_user_roles.
     """
     try:
-        from models.models import HospitalRole
-        import logging
-        logger = logging.getLogger(__name__)
-        
         logger.info(f"🔍 Listing doctors for hospital_id: {hospital_id}")
         
-        # Get user IDs with doctor role OR custom roles (excluding patient and hospital_admin)
-        # Custom roles are treated as staff/doctor-level access
-        user_ids_query = (
-            select(HospitalUserRoles.user_id)
-            .join(HospitalRole, HospitalRole.hospital_role_id == HospitalUserRoles.hospital_role_id)
-            .where(
-                and_(
-                    HospitalUserRoles.hospital_id == int(hospital_id),
-                    HospitalUserRoles.is_active == 1,
-                    # Include 'doctor' role and custom roles (exclude patient and hospital_admin)
-                    HospitalRole.role_name.notin_(['patient', 'hospital_admin'])
-                )
-            )
-            .distinct()
-        )
-        
-        logger.info(f"🔍 Executing user_ids query for hospital_id: {hospital_id}")
-        user_ids_res = await db.execute(user_ids_query)
-        user_ids = [row[0] for row in user_ids_res.fetchall()]
-        
-        if not user_ids:
-            logger.info(f"🔍 No doctor user IDs found for hospital_id: {hospital_id}")
-            return []
-        
-        logger.info(f"🔍 Found doctor user IDs: {user_ids}")
-        
-        # Now get the Users objects for these IDs
-        users_query = select(Users).where(Users.user_id.in_(user_ids)).limit(int(limit))
-        users_res = await db.execute(users_query)
-        doctors = list(users_res.scalars().all())
+        doctors_res = await db.execute(_HOSPITAL_DOCTORS, {"hospital_id": int(hospital_id), "limit": int(limit)})
+        doctors = list(doctors_res.scalars().all())
         
         logger.info(f"🔍 Found {len(doctors)} doctors for hospital_id: {hospital_id}")
         
         return doctors
     except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
         logger.error(f"❌ Error listing hospital doctors for hospital_id {hospital_id}: {e}")
         raise DatabaseError("Failed to list hospital doctors", operation="select", table="users/hospital_user_roles", original_error=e)
 
@@ -1,6 +1,6 @@
 from typing import List, Dict, Any, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
+from sqlalchemy import select, update, desc
 from sqlalchemy.exc import (
     IntegrityError,
     OperationalError,
@@ -20,9 +20,20 @@ from centralisedErrorHandling.ErrorHandling import (
     TransactionError
 )
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# role_master id for "patient"; seeded configuration, so it is cached as (expiry, role_id)
+# for a while instead of selected on every signup, and dropped early if an insert using it fails
+_PATIENT_ROLE_TTL = 300
+_patient_role_cache: Optional[tuple] = None
+
+# MySQL ER_DUP_ENTRY, and the users unique keys whose violation means the signup
+# collides with an existing account
+_ER_DUP_ENTRY = 1062
+_USER_UNIQUE_KEYS = ("email", "username")
+
 
 async def _safe_rollback(db: AsyncSession, context: str) -> None:
     """Safely attempt database rollback with error handling"""
@@ -38,6 +49,34 @@ async def _safe_rollback(db: AsyncSession, context: str) -> None:
 
 
 
+def _is_duplicate_user(e: IntegrityError) -> bool:
+    """True when e is a duplicate entry on the users email or username unique key"""
+    args = getattr(e.orig, "args", ())
+    if len(args) < 2 or args[0] != _ER_DUP_ENTRY:
+        return False
+    # MySQL 8 names the key as 'users.email', older servers as 'email'
+    message = str(args[1])
+    return any(f"'{key}'" in message or f"'users.{key}'" in message for key in _USER_UNIQUE_KEYS)
+
+
+async def _get_patient_role_id(db: AsyncSession) -> Optional[int]:
+    """Return the role_master id of the "patient" role"""
+    global _patient_role_cache
+    if _patient_role_cache is not None and _patient_role_cache[0] > time.time():
+        return _patient_role_cache[1]
+
+    role_res = await db.execute(select(RoleMaster.role_id).where(RoleMaster.role_name == "patient"))
+    role_id = role_res.scalar_one_or_none()
+    _patient_role_cache = (time.time() + _PATIENT_ROLE_TTL, role_id) if role_id is not None else None
+    return role_id
+
+
+def _invalidate_patient_role_cache() -> None:
+    """Drop the cached patient role id so the next signup reads role_master again"""
+    global _patient_role_cache
+    _patient_role_cache = None
+
+
 async def create_patient(db: AsyncSession, payload: RegisterPatientIn) -> Users:
     try:
         username = validate_username(payload.username)
@@ -47,49 +86,41 @@ async def create_patient(db: AsyncSession, payload: RegisterPatientIn) -> Users:
     except ValidationError as ve:
         raise ve
 
-    q = select(Users).where((Users.email == email) | (Users.username == username))
-    try:
-        res = await db.execute(q)
-        existing = res.scalars().first()
-    except Exception as e:
-        raise DatabaseError("Failed to query existing users", operation="select", table="users", original_error=e)
-
-    if existing:
-        raise ValidationError("A user with that email or username already exists")
-
     try:
-        role_q = select(RoleMaster).where(RoleMaster.role_name == "patient")
-        role_res = await db.execute(role_q)
-        patient_role = role_res.scalar_one_or_none()
+        patient_role_id = await _get_patient_role_id(db)
     except Exception as e:
         raise DatabaseError("Failed to find patient role", operation="select", table="role_master", original_error=e)
 
-    if not patient_role:
+    if patient_role_id is None:
         raise DatabaseError("Patient role not found in system", operation="select", table="role_master")
 
     user = Users(
         username=username,
         email=email,
         password_hash=generate_passwd_hash(password),
-        global_role_id=patient_role.role_id,
+        global_role_id=patient_role_id,
     )
     try:
         db.add(user)
         
-        # Flush with explicit exception handling
+        # Flush with explicit exception handling; the unique email/username indexes are the
+        # duplicate check, so a conflict on them is reported like any other invalid signup
         try:
             await db.flush()
         except IntegrityError as e:
             await _safe_rollback(db, "users")
+            if _is_duplicate_user(e):
+                logger.info(f"Duplicate email or username during patient flush: {e}")
+                raise ValidationError("A user with that email or username already exists") from e
+            # The cached patient role id may be stale (e.g. a failing global_role_id foreign key)
+            _invalidate_patient_role_cache()
             logger.error(f"Integrity error during patient flush: {e}")
-            raise DataIntegrityError(
-                "Duplicate email or username",
-                constraint_type="unique",
+            raise DatabaseError(
+                "Failed to create patient",
+                operation="insert",
                 table="users",
-                field="email/username",
-                value={"email": email, "username": username},
                 original_error=e,
-                context={"operation": "create_patient_flush"}
+                context={"email": email, "username": username}
             )
         except (DisconnectionError, OperationalError) as e:
             await _safe_rollback(db, "users")
@@ -112,47 +143,22 @@ async def create_patient(db: AsyncSession, payload: RegisterPatientIn) -> Users:
                 context={"email": email}
             )
         
-        # Refresh with explicit exception handling
-        try:
-            await db.refresh(user)
-        except InvalidRequestError as e:
-            await _safe_rollback(db, "users")
-            logger.error(f"Invalid session state during patient refresh: {e}")
-            raise TransactionError(
-                "Session state error during patient refresh",
-                operation="create_patient_refresh",
-                table="users",
-                transaction_state="refresh_failed",
-                original_error=e,
-                context={"email": email}
-            )
-        except (DisconnectionError, OperationalError) as e:
-            await _safe_rollback(db, "users")
-            logger.error(f"Database connection error during patient refresh: {e}")
-            raise ConnectionError(
-                "Database connection failed during patient refresh",
-                operation="create_patient_refresh",
-                original_error=e,
-                context={"table": "users", "email": email}
+        pending = [
+            UserDetails(
+                user_id=int(user.user_id),
+                first_name=payload.first_name,
+                last_name=payload.last_name,
+                phone=phone,
             )
-
-        details = UserDetails(
-            user_id=int(user.user_id),
-            first_name=payload.first_name,
-            last_name=payload.last_name,
-            phone=phone,
-        )
-        db.add(details)
-
+        ]
         if payload.hospital_id and payload.hospital_id > 0:
-            ph = PatientHospitals(user_id=int(user.user_id), hospital_id=int(payload.hospital_id))
-            db.add(ph)
+            pending.append(PatientHospitals(user_id=int(user.user_id), hospital_id=int(payload.hospital_id)))
+        db.add_all(pending)
 
         await db.commit()
-        await db.refresh(user)
         return user
         
-    except (ValidationError, DataIntegrityError, ConnectionError, TransactionError):
+    except (ValidationError, DatabaseError, DataIntegrityError, ConnectionError, TransactionError):
         raise
     except Exception as e:
         await _safe_rollback(db, "users")
@@ -176,30 +182,27 @@ async def get_patient_profile(db: AsyncSession, user_id: int) -> Optional[UserDe
 
 async def update_patient_profile(db: AsyncSession, user_id: int, update_data: Dict[str, Any]) -> UserDetails:
 
-    try:
-        details = await db.get(UserDetails, int(user_id))
-    except Exception as e:
-        raise DatabaseError("Failed to fetch profile", operation="select", table="user_details", original_error=e)
-
-    if not details:
-        raise UserNotFoundError("Profile not found", user_id=user_id)
-
     allowed = {"first_name", "last_name", "phone", "dob", "gender", "address"}
-    changed = False
-    for k, v in update_data.items():
-        if k in allowed and getattr(details, k) != v:
-            setattr(details, k, v)
-            changed = True
+    values = {k: v for k, v in update_data.items() if k in allowed}
 
-    if not changed:
+    if not values:
+        try:
+            details = await db.get(UserDetails, int(user_id))
+        except Exception as e:
+            raise DatabaseError("Failed to fetch profile", operation="select", table="user_details", original_error=e)
+        if not details:
+            raise UserNotFoundError("Profile not found", user_id=user_id)
         return details
 
     try:
-        db.add(details)
+        res = await db.execute(
+            update(UserDetails).where(UserDetails.user_id == int(user_id)).values(**values)
+        )
+        if res.rowcount == 0:
+            raise UserNotFoundError("Profile not found", user_id=user_id)
         await db.commit()
-        await db.refresh(details)
-        return details
-    except (DataIntegrityError, ConnectionError, TransactionError):
+        return await db.get(UserDetails, int(user_id), populate_existing=True)
+    except (UserNotFoundError, DataIntegrityError, ConnectionError, TransactionError):
         raise
     except Exception as e:
         await _safe_rollback(db, "user_details")
@@ -216,23 +219,32 @@ async def list_patient_consultations(db: AsyncSession, user_id: int, limit: int
 
     try:
         q = (
-            select(Consultation)
+            select(
+                Consultation.consultation_id,
+                Consultation.doctor_id,
+                Consultation.hospital_id,
+                Consultation.specialty_id,
+                Consultation.consultation_date,
+                Consultation.status,
+                Consultation.total_duration,
+            )
             .where(Consultation.patient_id == int(user_id))
             .order_by(desc(Consultation.consultation_date))
             .limit(int(limit))
         )
         res = await db.execute(q)
-        consultations = res.scalars().all()
+        consultations = res.all()
     except Exception as e:
         raise DatabaseError("Failed to list consultations", operation="select", table="consultation", original_error=e)
 
+    # Row columns already come back as int/None, so only the date needs converting
     return [{
-        "consultation_id": int(consultation.consultation_id),
-        "doctor_id": int(consultation.doctor_id) if consultation.doctor_id is not None else None,
-        "hospital_id": int(consultation.hospital_id) if consultation.hospital_id is not None else None,
-        "specialty_id": int(consultation.specialty_id) if consultation.specialty_id is not None else None,
-        "consultation_date": consultation.consultation_date.isoformat() if consultation.consultation_date else None,
-        "status": consultation.status,
-        "total_duration": int(consultation.total_duration or 0),
-    } for consultation in consultations]
+        "consultation_id": cid,
+        "doctor_id": did,
+        "hospital_id": hid,
+        "specialty_id": sid,
+        "consultation_date": cdate.isoformat() if cdate else None,
+        "status": st,
+        "total_duration": dur or 0,
+    } for cid, did, hid, sid, cdate, st, dur in consultations]
 
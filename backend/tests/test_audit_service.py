@@ -0,0 +1,37 @@
+import asyncio
+from unittest.mock import MagicMock
+
+from sqlalchemy.exc import IntegrityError
+
+from service.audit_service import create_audit_log
+
+
+class _Savepoint:
+    def __init__(self, error=None):
+        self.error = error
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None and self.error is not None:
+            raise self.error
+        return False
+
+
+def test_in_transaction_audit_failure_leaves_the_caller_transaction_alone(db):
+    db.begin_nested = MagicMock(return_value=_Savepoint(IntegrityError("INSERT", {}, Exception("fk"))))
+
+    asyncio.run(create_audit_log(db, event_type="consultation.create", entity_id=1, commit=False))
+
+    db.add.assert_called_once()
+    db.rollback.assert_not_awaited()
+    db.commit.assert_not_awaited()
+
+
+def test_standalone_audit_flushes_refreshes_and_commits(db):
+    asyncio.run(create_audit_log(db, event_type="user.login", entity_id=1))
+
+    db.flush.assert_awaited_once()
+    db.refresh.assert_awaited_once()
+    db.commit.assert_awaited_once()
@@ -0,0 +1,212 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy.dialects import mysql
+from sqlalchemy.exc import OperationalError
+
+from centralisedErrorHandling.ErrorHandling import DatabaseError
+from service import consultation_service as cs
+
+
+def _mysql_sql(stmt) -> str:
+    return str(stmt.compile(dialect=mysql.dialect()))
+
+
+def _usage_row(session_id=7, tokens=10):
+    return cs._api_usage_row(
+        {"service_type": "openai_chat", "tokens_used": tokens, "cost": 0.01},
+        response_time_ms=120,
+        session_id=session_id,
+    )
+
+
+@pytest.fixture(autouse=True)
+def _fresh_module_state(monkeypatch):
+    # Queues and tasks are bound to the event loop that created them; each test runs its own
+    monkeypatch.setattr(cs, "_telemetry_queue", None)
+    monkeypatch.setattr(cs, "_telemetry_writer", None)
+    monkeypatch.setattr(cs, "_consultation_ids_cache", {})
+    monkeypatch.setattr(cs, "_transient_backoff", lambda attempt: 0)
+
+
+def test_append_message_inserts_and_commits_before_returning(db):
+    asyncio.run(cs.append_message(db, session_id="7", sender_type="patient", message_text=None))
+
+    stmt, row = db.execute.await_args.args
+    assert stmt is cs._INSERT_MESSAGES
+    assert row == {
+        "session_id": 7,
+        "sender_type": "patient",
+        "message_text": "",
+        "audio_url": None,
+        "processing_time_ms": 1000,
+    }
+    db.commit.assert_awaited_once()
+
+
+def test_append_audio_message_failure_raises_without_retrying_the_insert(db):
+    db.execute.side_effect = OperationalError("INSERT", {}, Exception("gone away"))
+
+    with pytest.raises(DatabaseError):
+        asyncio.run(cs.append_audio_message(
+            db, session_id=7, sender_type="assistant", message_text="hi",
+            audio_url="a.mp3", processing_time_ms=50,
+        ))
+
+    assert db.execute.await_count == 1
+    db.commit.assert_not_awaited()
+    db.rollback.assert_awaited()
+
+
+def test_idempotent_update_is_retried_on_transient_errors(db):
+    db.execute.side_effect = [OperationalError("UPDATE", {}, Exception("gone away")), None]
+
+    asyncio.run(cs.update_consultation_status(db, consultation_id=3, status="completed"))
+
+    assert db.execute.await_count == 2
+    db.commit.assert_awaited_once()
+
+
+def test_unexpected_errors_are_mapped_to_database_error(db):
+    db.execute.side_effect = ValueError("boom")
+
+    with pytest.raises(DatabaseError):
+        asyncio.run(cs.update_session_tokens(db, session_id=7, tokens_used=5))
+    db.rollback.assert_awaited()
+
+
+def test_session_counter_increment_is_atomic_in_sql():
+    sql = _mysql_sql(cs._INCREMENT_SESSION_STATS)
+    assert "total_tokens_used=(consultation_sessions.total_tokens_used + %s)" in sql
+    assert "total_api_calls=(consultation_sessions.total_api_calls + %s)" in sql
+
+
+def test_update_session_tokens_increments_tokens_only(db):
+    asyncio.run(cs.update_session_tokens(db, session_id="7", tokens_used=25))
+
+    stmt, params = db.execute.await_args.args
+    assert stmt is cs._INCREMENT_SESSION_STATS
+    assert params == {"sid": 7, "tokens": 25, "calls": 0}
+    db.commit.assert_awaited_once()
+
+
+def test_update_session_stats_increments_tokens_and_calls(db):
+    asyncio.run(cs.update_session_stats(db, session_id=7, tokens_used=25, api_calls=2))
+
+    stmt, params = db.execute.await_args.args
+    assert stmt is cs._INCREMENT_SESSION_STATS
+    assert params == {"sid": 7, "tokens": 25, "calls": 2}
+    db.commit.assert_awaited_once()
+
+
+def test_record_turn_commits_messages_and_counters_together(db, monkeypatch):
+    queued = AsyncMock()
+    monkeypatch.setattr(cs, "_queue_api_usage", queued)
+    turn = cs.TurnRecord(
+        session_id=7,
+        patient_text="hello",
+        assistant_text="hi there",
+        service_type="openai_chat",
+        response_time_ms=300,
+        tokens_used=12,
+    )
+
+    asyncio.run(cs.record_turn(db, turn))
+
+    (insert_stmt, messages), (increment_stmt, params) = [c.args for c in db.execute.await_args_list]
+    assert insert_stmt is cs._INSERT_MESSAGES
+    assert [m["sender_type"] for m in messages] == ["patient", "assistant"]
+    assert increment_stmt is cs._INCREMENT_SESSION_STATS
+    assert params == {"sid": 7, "tokens": 12, "calls": 1}
+    db.commit.assert_awaited_once()
+    (rows,) = queued.await_args.args
+    assert rows[0]["session_id"] == 7 and rows[0]["tokens_used"] == 12
+
+
+def test_session_increments_sum_rows_per_session():
+    rows = [_usage_row(7, 10), _usage_row(7, 5), _usage_row(8, 1), _usage_row(None, 99)]
+
+    assert sorted(cs._session_increments(rows), key=lambda p: p["sid"]) == [
+        {"sid": 7, "tokens": 15, "calls": 2},
+        {"sid": 8, "tokens": 1, "calls": 1},
+    ]
+
+
+def test_usage_queue_is_bounded_and_overflow_is_written_inline(monkeypatch):
+    written = []
+
+    async def record_batch(rows):
+        written.append(list(rows))
+
+    monkeypatch.setattr(cs, "_TELEMETRY_QUEUE_MAX", 2)
+    monkeypatch.setattr(cs, "_write_telemetry_batch", record_batch)
+    rows = [_usage_row(tokens=n) for n in range(3)]
+
+    async def run():
+        await cs._queue_api_usage(rows)
+        assert cs._telemetry_queue.maxsize == 2
+        # The row that did not fit was written before _queue_api_usage returned
+        assert written == [[rows[2]]]
+        await cs.flush_telemetry()
+        cs._telemetry_writer.cancel()
+
+    asyncio.run(run())
+
+    assert sorted(r["tokens_used"] for batch in written for r in batch) == [0, 1, 2]
+
+
+def test_consultation_ids_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(cs, "_CONSULTATION_IDS_MAX", 3)
+
+    for cid in range(5):
+        cs._cache_consultation_ids(cid, (cid, cid, cid))
+
+    assert list(cs._consultation_ids_cache) == [2, 3, 4]
+
+
+def test_consultation_ids_cache_prunes_expired_entries(monkeypatch):
+    cs._consultation_ids_cache[1] = (0, (1, 1, 1))
+
+    cs._cache_consultation_ids(2, (2, 2, 2))
+
+    assert list(cs._consultation_ids_cache) == [2]
+
+
+def test_flush_telemetry_writes_inline_when_the_writer_is_gone(monkeypatch):
+    written = []
+
+    async def record_batch(rows):
+        written.append(list(rows))
+
+    monkeypatch.setattr(cs, "_write_telemetry_batch", record_batch)
+    monkeypatch.setattr(cs, "_TELEMETRY_BATCH_MAX", 2)
+    rows = [_usage_row(tokens=n) for n in range(3)]
+
+    async def run():
+        cs.start_telemetry_writer()
+        cs._telemetry_writer.cancel()
+        await asyncio.sleep(0)
+        for row in rows:
+            cs._telemetry_queue.put_nowait(row)
+        await asyncio.wait_for(cs.flush_telemetry(), 1)
+        assert cs._telemetry_queue.empty()
+
+    asyncio.run(run())
+
+    assert written == [rows[:2], rows[2:]]
+
+
+def test_flush_telemetry_gives_up_after_the_timeout(monkeypatch):
+    async def stuck_batch(rows):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(cs, "_write_telemetry_batch", stuck_batch)
+    monkeypatch.setattr(cs, "_TELEMETRY_FLUSH_TIMEOUT", 0.05)
+
+    async def run():
+        await cs._queue_api_usage([_usage_row()])
+        await asyncio.wait_for(cs.flush_telemetry(), 1)
+        cs._telemetry_writer.cancel()
+
+    asyncio.run(run())
@@ -0,0 +1,41 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from service.hospital_admin_service import hospital_admin_create_user
+
+PAYLOAD = {"email": "new.doctor@example.com", "password": "correct-horse", "role_name": "doctor"}
+
+# What auth_service puts in the token for a user with hospital roles but no global role
+HOSPITAL_ONLY_ACTOR = {
+    "user_id": 1,
+    "username": "admin",
+    "email": "admin@example.com",
+    "global_role": None,
+    "hospital_roles": [{"hospital_id": 2, "hospital_name": "General", "role_id": 9, "role_name": "hospital_admin"}],
+    "hospital_id": 2,
+}
+
+
+def _create(db, hospital_id):
+    return asyncio.run(hospital_admin_create_user(db, HOSPITAL_ONLY_ACTOR, hospital_id, dict(PAYLOAD)))
+
+
+def test_hospital_only_actor_is_refused_for_another_hospital(db):
+    with pytest.raises(HTTPException) as exc_info:
+        _create(db, hospital_id=3)
+
+    assert exc_info.value.status_code == 403
+    db.execute.assert_not_awaited()
+
+
+def test_hospital_only_actor_passes_the_check_for_their_hospital(db):
+    db.execute.return_value = MagicMock(all=MagicMock(return_value=[]))
+
+    with pytest.raises(HTTPException) as exc_info:
+        _create(db, hospital_id=2)
+
+    # Past the authorization check and into the lookups, where the hospital is missing
+    assert exc_info.value.status_code == 404
@@ -0,0 +1,50 @@
+import os
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+
+def _read(name):
+    with open(os.path.join(MIGRATIONS, name)) as f:
+        return f.read()
+
+
+def test_consultation_month_migration_adds_the_column_and_its_index():
+    sql = _read("002_consultation_month.sql")
+
+    assert "ALTER TABLE consultation\n" in sql
+    assert "ADD COLUMN consultation_month CHAR(7) AS (DATE_FORMAT(consultation_date, '%Y-%m')) STORED" in sql
+    assert "ADD INDEX idx_consult_doctor_month (doctor_id, consultation_month)" in sql
+
+
+def _index_swap(name, table, new_index, old_index):
+    sql = _read(name)
+    add = sql.index(f"ALTER TABLE {table} ADD INDEX {new_index}")
+    # The replaced index is dropped only after its successor exists, so foreign keys stay indexed
+    assert add < sql.index(f"ALTER TABLE {table} DROP INDEX {old_index};")
+
+
+def test_hospital_user_roles_index_migration():
+    _index_swap(
+        "003_hospital_user_roles_user_active_index.sql",
+        "hospital_user_roles",
+        "idx_hur_user_active (user_id, is_active)",
+        "idx_hur_user",
+    )
+
+
+def test_consultation_sessions_index_migration():
+    _index_swap(
+        "004_consultation_sessions_end_index.sql",
+        "consultation_sessions",
+        "idx_cs_consultation_end (consultation_id, session_end, session_start)",
+        "idx_cs_consultation",
+    )
+
+
+def test_consultation_doctor_index_migration():
+    _index_swap(
+        "005_consultation_doctor_date_patient_index.sql",
+        "consultation",
+        "idx_consult_doctor_date_patient (doctor_id, consultation_date, patient_id)",
+        "idx_consult_doctor_date",
+    )
@@ -0,0 +1,68 @@
+import asyncio
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from centralisedErrorHandling.ErrorHandling import DatabaseError, ValidationError
+from schema.schema import RegisterPatientIn
+from service import patients_service as ps
+
+PAYLOAD = RegisterPatientIn(
+    username="new_patient",
+    email="new@example.com",
+    password="correct-horse",
+    first_name="New",
+    last_name="Patient",
+    phone=None,
+)
+
+
+class _MySQLError(Exception):
+    """Shape of the aiomysql/pymysql error wrapped by IntegrityError.orig"""
+
+
+@pytest.fixture(autouse=True)
+def _cached_patient_role(monkeypatch):
+    monkeypatch.setattr(ps, "_patient_role_cache", (time.time() + 60, 4))
+    monkeypatch.setattr(ps, "generate_passwd_hash", lambda password: "hashed")
+
+
+def _create_with_flush_error(db, code, message):
+    db.flush.side_effect = IntegrityError("INSERT INTO users", {}, _MySQLError(code, message))
+    return asyncio.run(ps.create_patient(db, PAYLOAD))
+
+
+@pytest.mark.parametrize("key", ["users.email", "email", "users.username", "username"])
+def test_duplicate_email_or_username_is_a_validation_error(db, key):
+    with pytest.raises(ValidationError):
+        _create_with_flush_error(db, 1062, f"Duplicate entry 'x' for key '{key}'")
+
+    db.rollback.assert_awaited()
+    assert ps._patient_role_cache is not None
+
+
+def test_duplicate_on_another_key_is_a_database_error(db):
+    with pytest.raises(DatabaseError):
+        _create_with_flush_error(db, 1062, "Duplicate entry 'x' for key 'users.phone_unique'")
+
+
+def test_foreign_key_failure_is_a_database_error_and_drops_the_cached_role(db):
+    with pytest.raises(DatabaseError) as exc_info:
+        _create_with_flush_error(
+            db, 1452, "Cannot add or update a child row: a foreign key constraint fails (global_role_id)"
+        )
+
+    assert not isinstance(exc_info.value, ValidationError)
+    assert isinstance(exc_info.value.original_error, IntegrityError)
+    assert ps._patient_role_cache is None
+
+
+def test_patient_role_id_is_reloaded_after_the_ttl(db, monkeypatch):
+    monkeypatch.setattr(ps, "_patient_role_cache", (time.time() - 1, 4))
+    db.execute.return_value = MagicMock(scalar_one_or_none=MagicMock(return_value=9))
+
+    assert asyncio.run(ps._get_patient_role_id(db)) == 9
+    assert asyncio.run(ps._get_patient_role_id(db)) == 9
+    db.execute.assert_awaited_once()
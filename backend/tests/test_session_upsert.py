@@ -0,0 +1,44 @@
+import asyncio
+import os
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import mysql
+
+from service import consultation_service as cs
+
+MIGRATION = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "migrations",
+    "001_consultation_sessions_active_unique.sql",
+)
+
+
+def _run_upsert(db, lastrowid, rowcount):
+    db.execute.return_value = MagicMock(lastrowid=lastrowid, rowcount=rowcount)
+    session_id = asyncio.run(cs.get_or_create_session(db, consultation_id="11", session_type="tts"))
+    (stmt,) = db.execute.await_args.args
+    return session_id, str(stmt.compile(dialect=mysql.dialect()))
+
+
+def test_upsert_reuses_the_active_session_through_last_insert_id(db):
+    session_id, sql = _run_upsert(db, lastrowid=42, rowcount=1)
+
+    assert session_id == 42
+    assert sql.startswith("INSERT INTO consultation_sessions")
+    assert "ON DUPLICATE KEY UPDATE session_id = last_insert_id(consultation_sessions.session_id)" in sql
+    db.commit.assert_awaited_once()
+
+
+def test_upsert_result_does_not_depend_on_rowcount(db):
+    # CLIENT_FOUND_ROWS reports a matched duplicate as 1, like an insert; only lastrowid counts
+    assert _run_upsert(db, lastrowid=42, rowcount=1)[0] == _run_upsert(db, lastrowid=42, rowcount=2)[0] == 42
+
+
+def test_migration_dedupes_active_sessions_before_adding_the_unique_key():
+    with open(MIGRATION) as f:
+        sql = f.read()
+
+    dedupe = sql.index("UPDATE consultation_sessions")
+    alter = sql.index("ALTER TABLE consultation_sessions")
+    assert dedupe < alter
+    assert "ADD UNIQUE KEY uq_cs_active_consultation (active_consultation_id)" in sql[alter:]
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+import jwt
+
+from config import settings
+from utils.utils import create_access_token, decode_token
+
+USER = {"user_id": 5, "email": "doc@example.com", "hospital_roles": [{"hospital_id": 1, "role_name": "doctor"}]}
+
+
+def test_access_token_round_trips_through_pyjwt():
+    token = create_access_token(USER, expiry=timedelta(minutes=5), refresh=True)
+
+    claims = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+    assert claims["user"] == USER
+    assert claims["refresh"] is True
+    assert claims["exp"] - claims["iat"] == 300
+    assert jwt.get_unverified_header(token) == {"alg": settings.JWT_ALGORITHM, "typ": "JWT"}
+    assert decode_token(token) == claims
+
+
+def test_access_token_is_signed_with_the_current_secret(monkeypatch):
+    monkeypatch.setattr(settings, "JWT_SECRET", "rotated-secret-at-least-32-bytes-long")
+
+    token = create_access_token(USER)
+
+    assert jwt.decode(token, "rotated-secret-at-least-32-bytes-long", algorithms=[settings.JWT_ALGORITHM])["user"] == USER
@@ -117,7 +117,8 @@ CREATE TABLE hospital_user_roles (
     FOREIGN KEY (hospital_id) REFERENCES hospital_master(hospital_id) ON DELETE CASCADE,
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
     FOREIGN KEY (hospital_role_id) REFERENCES hospital_role(hospital_role_id) ON DELETE CASCADE,
-    INDEX idx_hur_user (user_id),
+    -- (user_id, is_active) plus the implicit primary key columns covers the login hospital-roles lookup
+    INDEX idx_hur_user_active (user_id, is_active),
     INDEX idx_hur_role (hospital_role_id)
 ) ENGINE=InnoDB;
 
@@ -218,11 +219,13 @@ CREATE TABLE consultation (
     total_duration INT DEFAULT 0,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    consultation_month CHAR(7) AS (DATE_FORMAT(consultation_date, '%Y-%m')) STORED,
     FOREIGN KEY (patient_id) REFERENCES users(user_id) ON DELETE CASCADE,
     FOREIGN KEY (doctor_id) REFERENCES users(user_id) ON DELETE CASCADE,
     FOREIGN KEY (hospital_id) REFERENCES hospital_master(hospital_id) ON DELETE SET NULL,
     FOREIGN KEY (specialty_id) REFERENCES specialties(specialty_id) ON DELETE CASCADE,
-    INDEX idx_consult_doctor_date (doctor_id, consultation_date),
+    INDEX idx_consult_doctor_date_patient (doctor_id, consultation_date, patient_id), -- covers doctor listings/analytics
+    INDEX idx_consult_doctor_month (doctor_id, consultation_month), -- monthly consultation counts
     INDEX idx_consult_patient_date (patient_id, consultation_date)
 ) ENGINE=InnoDB;
 
@@ -235,9 +238,11 @@ CREATE TABLE consultation_sessions (
     total_tokens_used INT DEFAULT 0,
     total_api_calls INT DEFAULT 0,
     session_status VARCHAR(50) DEFAULT 'active', -- replaces ENUM
+    active_consultation_id INT AS (CASE WHEN session_status = 'active' THEN consultation_id END) STORED,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_cs_active_consultation (active_consultation_id), -- at most one active session per consultation
     FOREIGN KEY (consultation_id) REFERENCES consultation(consultation_id) ON DELETE CASCADE,
-    INDEX idx_cs_consultation (consultation_id)
+    INDEX idx_cs_consultation_end (consultation_id, session_end, session_start) -- covers duration sums
 ) ENGINE=InnoDB;
 
 CREATE TABLE consultation_messages (